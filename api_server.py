@@ -0,0 +1,189 @@
+# api_server.py
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+from patterns import PATTERN_COLUMN, pattern_frame
+
+API_HOST = os.getenv('WHR_API_HOST', '127.0.0.1')
+API_PORT = int(os.getenv('WHR_API_PORT', '8502'))
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+MIN_GZIP_BYTES = 1024  # Smaller bodies are not worth compressing
+
+
+class ResultStore:
+    """
+    Process-wide copy of the latest scan results for the HTTP API. The dashboard
+    publishes after every scan; encoded responses are cached until the next publish,
+    and ETags hash the body, so results a rescan left unchanged keep their ETag.
+    """
+
+    def __init__(self):
+        self.published_at = None
+        self.frames = {}
+        self.signaling_tickers = []
+        self.diff = {'new': [], 'disappeared': [], 'stable': []}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def publish(self, frames, signaling_tickers, diff):
+        """
+        Replace the served results.
+        Args:
+            frames: dict ticker -> analyzed DataFrame (never modified in place, so not copied)
+            signaling_tickers: list of signaling tickers
+            diff: dict with 'new', 'disappeared' and 'stable' ticker lists
+        """
+        with self._lock:
+            self.published_at = pd.Timestamp.now(tz='UTC')
+            self.frames = dict(frames)
+            self.signaling_tickers = list(signaling_tickers)
+            self.diff = {k: list(v) for k, v in diff.items()}
+            self._responses = {}
+
+    def response(self, key, build):
+        """
+        Encoded (body, gzipped_body, content_type, etag) for `key` until the next
+        publish; `build` is called with the store lock held and returns
+        (body, content_type). gzipped_body is None for small bodies; its ETag is
+        `etag` with a -gzip suffix (see gzip_etag).
+        """
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is None:
+                body, content_type = build()
+                gzipped = gzip.compress(body, compresslevel=5) if len(body) >= MIN_GZIP_BYTES else None
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                cached = self._responses[key] = (body, gzipped, content_type, etag)
+            return cached
+
+    def signals_frame(self):
+        """Latest bar of every signaling ticker, one row per ticker."""
+        rows = [unpack_patterns(self.frames[t].iloc[[-1]]).reset_index().assign(ticker=t) for t in self.signaling_tickers if t in self.frames]
+        if not rows:
+            return pd.DataFrame(columns=['ticker', 'datetime'])
+        df = pd.concat(rows, ignore_index=True)
+        return df[['ticker'] + [c for c in df.columns if c != 'ticker']]
+
+    def diff_frame(self):
+        return pd.DataFrame([(t, status) for status, tickers in self.diff.items() for t in tickers], columns=['ticker', 'status'])
+
+
+RESULTS = ResultStore()
+
+
+def gzip_etag(etag):
+    """Distinct strong ETag for the gzip-encoded representation."""
+    return f'{etag[:-1]}-gzip"'
+
+
+def unpack_patterns(df):
+    """Replace the PATTERN_COLUMN bitmask with one boolean column per pattern, which clients can read."""
+    if PATTERN_COLUMN not in df.columns:
+        return df
+    return df.drop(columns=PATTERN_COLUMN).join(pattern_frame(df))
+
+
+def encode_frame(df, fmt, meta=None):
+    """Serialize a DataFrame as JSON records (with `meta` fields) or an Arrow IPC stream."""
+    if fmt == 'arrow':
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue(), ARROW_MIME
+    payload = dict(meta or {})
+    payload['data'] = json.loads(df.to_json(orient='records', date_format='iso'))
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    Read-only endpoints over RESULTS:
+        GET /signals                   latest bar of each signaling ticker
+        GET /tickers/<T>/indicators    full indicator series of one ticker
+        GET /diff                      new / disappeared / stable signaling tickers
+    JSON by default; Arrow with ?format=arrow or an Accept header of ARROW_MIME.
+    """
+
+    store = RESULTS
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        fmt = parse_qs(url.query).get('format', [None])[0]
+        if fmt is None:
+            fmt = 'arrow' if ARROW_MIME in self.headers.get('Accept', '') else 'json'
+        if fmt not in ('json', 'arrow'):
+            return self._error(400, f"Unknown format {fmt!r}")
+
+        store = self.store
+        if parts == ['signals']:
+            build = lambda: encode_frame(store.signals_frame(), fmt)
+        elif parts == ['diff']:
+            build = lambda: encode_frame(store.diff_frame(), fmt, store.diff)
+        elif len(parts) == 3 and parts[0] == 'tickers' and parts[2] == 'indicators':
+            ticker = parts[1].upper()
+            # Looked up inside build, under the store lock, so a concurrent publish cannot remove it midway
+            build = lambda: encode_frame(unpack_patterns(store.frames[ticker]).reset_index(), fmt, {'ticker': ticker})
+        else:
+            return self._error(404, "Not found")
+
+        try:
+            body, gzipped, content_type, etag = store.response((tuple(parts), fmt), build)
+        except KeyError:
+            return self._error(404, f"No results for {parts[1].upper()}")
+        except ImportError:
+            return self._error(501, "Arrow output requires pyarrow on the server")
+
+        if gzipped is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body, etag, encoding = gzipped, gzip_etag(etag), 'gzip'
+        else:
+            encoding = None
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self._cache_headers()
+            self.end_headers()
+            return
+        self._send(200, body, content_type, etag, encoding)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({'error': message}).encode('utf-8'), 'application/json; charset=utf-8')
+
+    def _cache_headers(self):
+        self.send_header('Cache-Control', 'no-cache')  # Clients must revalidate, the ETag makes that cheap
+        self.send_header('Vary', 'Accept, Accept-Encoding')
+
+    def _send(self, status, body, content_type, etag=None, encoding=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self._cache_headers()
+        if etag:
+            self.send_header('ETag', etag)
+        if self.store.published_at is not None:
+            self.send_header('X-Published-At', self.store.published_at.isoformat())
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Polling clients would flood the Streamlit console
+
+
+def start_api_server(host=API_HOST, port=API_PORT):
+    """Serve RESULTS on a daemon thread; returns the server (call shutdown() to stop it)."""
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='results-api', daemon=True).start()
+    print(f"Results API listening on http://{host}:{server.server_address[1]}")
+    return server
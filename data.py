@@ -1,9 +1,27 @@
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import io
 import os
+import threading
+import time
 import requests
+from market_calendar import EXCHANGE_TZ, filter_session_bars, trading_days
+from resample import resample_bars
+
+class ScanCancelled(TimeoutError):
+    """The caller's deadline passed or its cancel event was set; no provider should be tried."""
+
 
 class DataManager:
+    # Hourly bars shared by every DataManager in the process: symbol -> (fetched_at, start, end, DataFrame)
+    HOURLY_CACHE_TTL = 15 * 60
+    _hourly_cache = {}
+    _cache_lock = threading.Lock()
+    # Whole-market daily bars of completed sessions: date -> DataFrame
+    _grouped_daily_cache = {}
+
     def __init__(self):
         self.data = 0
         self.API_KEYS = {
@@ -17,6 +35,115 @@ class DataManager:
 
         self.PROVIDERS = ['polygon', 'twelvedata', 'fmp', 'alpha_vantage', 'eodhd', 'marketstack']
         self.HOURLY_PROVIDERS = ['polygon', 'twelvedata', 'fmp', 'alpha_vantage']
+        # Timezone of the naive timestamps each hourly provider returns
+        self.HOURLY_TIMEZONES = {
+            'polygon': 'UTC',
+            'twelvedata': 'America/New_York',
+            'fmp': 'America/New_York',
+            'alpha_vantage': 'America/New_York',
+        }
+        self.MAX_WORKERS = 4  # Parallel slice downloads per symbol
+        self.ALPHA_VANTAGE_COMPACT_DAYS = 140  # 'compact' covers the latest 100 trading days
+        self.TWELVEDATA_SLICE_DAYS = 365  # Keeps each hourly request under the 5000-bar cap
+        self.REQUEST_TIMEOUT = 20  # Seconds per HTTP request (connect and each read)
+        self.PROVIDER_TIME_LIMIT = 30  # Seconds one provider may spend on a symbol before falling back
+        # Limits of the fetch in progress (see fetch_hourly_data)
+        self._deadline = None
+        self._provider_deadline = None
+        self._cancel = None
+
+    @staticmethod
+    def _month_slices(start_date, end_date):
+        """Return the 'YYYY-MM' months overlapping [start_date, end_date]."""
+        months = pd.period_range(pd.Period(start_date, 'M'), pd.Period(end_date, 'M'), freq='M')
+        return [str(m) for m in months]
+
+    @staticmethod
+    def _window_slices(start_date, end_date, days):
+        """Split [start_date, end_date] into consecutive (start, end) windows of at most `days` days."""
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        slices = []
+        while start <= end:
+            stop = min(start + timedelta(days=days - 1), end)
+            slices.append((start.strftime('%Y-%m-%d'), stop.strftime('%Y-%m-%d')))
+            start = stop + timedelta(days=1)
+        return slices
+
+    @staticmethod
+    def _to_utc(timestamps, tz):
+        """Localize naive provider timestamps to `tz` and convert them to UTC."""
+        timestamps = pd.to_datetime(timestamps)
+        if timestamps.dt.tz is None:
+            timestamps = timestamps.dt.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward')
+        return timestamps.dt.tz_convert('UTC')
+
+    def _fetch_slices(self, fetch_slice, slices, time_col):
+        """Download slices in parallel and stitch them into one frame ordered by `time_col`."""
+        if len(slices) == 1:
+            frames = [fetch_slice(slices[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(slices))) as pool:
+                frames = list(pool.map(fetch_slice, slices))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(subset=time_col).sort_values(time_col).reset_index(drop=True)
+        return df
+
+    def _limited(self, deadline=None, cancel=None):
+        """
+        Copy of this manager whose requests stop at `deadline` or when `cancel` is set.
+        Limits live on the copy, so concurrent fetches through one manager keep their own.
+        """
+        limited = copy.copy(self)
+        limited._deadline, limited._cancel = deadline, cancel
+        return limited
+
+    def _get(self, url, **kwargs):
+        """requests.get bounded by REQUEST_TIMEOUT and the limits of the fetch in progress."""
+        if (self._cancel is not None and self._cancel.is_set()) or (self._deadline is not None and time.time() >= self._deadline):
+            raise ScanCancelled("Fetch stopped: time limit reached or scan cancelled")
+        timeout = self.REQUEST_TIMEOUT
+        for deadline in (self._deadline, self._provider_deadline):
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"Provider time limit of {self.PROVIDER_TIME_LIMIT}s exceeded")
+                timeout = min(timeout, remaining)
+        return requests.get(url, timeout=timeout, **kwargs)
+
+    @staticmethod
+    def _check_payload(provider, payload):
+        """
+        Raise when a provider answered HTTP 200 with an error or rate-limit payload, so
+        it is not mistaken for an empty result (and a sliced fetch does not drop a slice).
+        """
+        if not isinstance(payload, dict):
+            return payload
+        if provider == 'alpha_vantage':
+            for key in ('Error Message', 'Information', 'Note'):
+                if key in payload:
+                    raise ValueError(f"Alpha Vantage {key}: {payload[key]}")
+        elif provider == 'twelvedata' and payload.get('status') == 'error':
+            raise ValueError(f"TwelveData error: {payload.get('message')}")
+        elif provider == 'polygon' and payload.get('status') == 'ERROR':
+            raise ValueError(f"Polygon error: {payload.get('error') or payload.get('message')}")
+        return payload
+
+    def _polygon_results(self, url):
+        """Collect all aggregate results for a Polygon query, following `next_url` cursors."""
+        results = []
+        while url:
+            resp = self._get(url)
+            resp.raise_for_status()
+            payload = self._check_payload('polygon', resp.json())
+            results.extend(payload.get('results', []))
+            url = payload.get('next_url')
+            if url:
+                url = f"{url}&apiKey={self.API_KEYS['polygon']}"
+        return results
 
     def fetch_daily_data(self, symbol: str, start_date: str, end_date: str = None) -> pd.DataFrame:
         """
@@ -53,34 +180,52 @@ class DataManager:
         print(f"All providers failed to fetch daily data for {symbol}")
         return pd.DataFrame()  # Return empty DataFrame instead of raising an error
 
-    def fetch_hourly_data(self, symbol: str, start_date: str, end_date: str = None) -> pd.DataFrame:
+    def fetch_hourly_data(self, symbol: str, start_date: str, end_date: str = None, use_cache: bool = True,
+                          deadline: float = None, cancel: threading.Event = None) -> pd.DataFrame:
         """
         Fetches hourly historical stock data using multiple APIs with fallback.
+        Each provider gets at most PROVIDER_TIME_LIMIT seconds before the next one is tried.
         Args:
             symbol: Stock ticker (e.g., 'AAPL')
             start_date: Start date 'YYYY-MM-DD'
             end_date: End date 'YYYY-MM-DD' (default: today)
+            use_cache: Serve from the shared cache when it covers the range (False forces a download)
+            deadline: Absolute time.time() after which no more requests are made
+            cancel: Event that stops the fetch at its next request when set
         Returns:
-            pd.DataFrame with columns: datetime, open, high, low, close, volume
+            pd.DataFrame with columns: datetime (tz-aware UTC), open, high, low, close, volume
+        Raises:
+            ScanCancelled: the deadline passed or `cancel` was set
         """
         if end_date is None:
             end_date = datetime.today().strftime('%Y-%m-%d')
+
+        cached = self.get_cached_hourly_data(symbol, start_date, end_date) if use_cache else None
+        if cached is not None:
+            print(f"Hourly data for {symbol} served from cache")
+            return cached
         
+        limited = self._limited(deadline, cancel)
         for provider in self.HOURLY_PROVIDERS:
             try:
                 print(f"Trying provider: {provider} for hourly data")
-                fetch_func = getattr(self, f'fetch_from_{provider}_hourly', None)
+                limited._provider_deadline = time.time() + self.PROVIDER_TIME_LIMIT
+                fetch_func = getattr(limited, f'fetch_from_{provider}_hourly', None)
                 if fetch_func:
                     df = fetch_func(symbol, start_date, end_date)
                     if not df.empty:
                         print(f"Hourly data fetched successfully from {provider}")
-                        return df
+                        df['datetime'] = self._to_utc(df['datetime'], self.HOURLY_TIMEZONES[provider])
+                        self.store_hourly_data(symbol, start_date, end_date, df)
+                        return df.copy()
                     else:
                         print(f"No hourly data from {provider}, trying next...")
                         continue
                 else:
                     print(f"Function fetch_from_{provider}_hourly not found.")
                     continue
+            except ScanCancelled:
+                raise
             except Exception as e:
                 print(f"Error with {provider}: {e}")
                 continue
@@ -88,11 +233,168 @@ class DataManager:
         print(f"All providers failed to fetch hourly data for {symbol}")
         return pd.DataFrame()  # Return empty DataFrame instead of raising an error
 
-    def fetch_from_polygon(self, symbol, start_date, end_date):
-        url = f"https://api.polygon.io/v2/aggs/ticker/{symbol}/range/1/day/{start_date}/{end_date}?apiKey={self.API_KEYS['polygon']}"
-        resp = requests.get(url)
+    def fetch_resampled_data(self, symbol: str, start_date: str, end_date: str = None, timeframe: str = '1D') -> pd.DataFrame:
+        """
+        Derives daily, 4-hour or weekly bars from hourly data (cached when available),
+        so higher timeframes cost no extra API calls.
+        Args:
+            symbol: Stock ticker (e.g., 'AAPL')
+            start_date: Start date 'YYYY-MM-DD'
+            end_date: End date 'YYYY-MM-DD' (default: today)
+            timeframe: '4h', '1D' or '1W'
+        Returns:
+            pd.DataFrame with columns: date, open, high, low, close, volume
+        """
+        if end_date is None:
+            end_date = datetime.today().strftime('%Y-%m-%d')
+        hourly = self.fetch_hourly_data(symbol, start_date, end_date)
+        if hourly.empty:
+            return hourly
+        hourly = hourly.set_index('datetime')
+        hourly[['open', 'high', 'low', 'close', 'volume']] = hourly[['open', 'high', 'low', 'close', 'volume']].apply(pd.to_numeric, errors='coerce')
+        bars = resample_bars(filter_session_bars(hourly.dropna(), start_date, end_date), timeframe)
+        bars = bars.drop(columns='last_bar').reset_index()
+        fmt = '%Y-%m-%d %H:%M' if timeframe == '4h' else '%Y-%m-%d'
+        bars['datetime'] = bars['datetime'].dt.tz_convert(EXCHANGE_TZ).dt.strftime(fmt)
+        return bars.rename(columns={'datetime': 'date'})
+
+    def get_cached_hourly_data(self, symbol: str, start_date: str, end_date: str):
+        """
+        Returns cached hourly bars when a fresh cache entry covers the requested range.
+        Args:
+            symbol: Stock ticker (e.g., 'AAPL')
+            start_date: Start date 'YYYY-MM-DD'
+            end_date: End date 'YYYY-MM-DD'
+        Returns:
+            pd.DataFrame sliced to the range, or None on a cache miss
+        """
+        with self._cache_lock:
+            entry = self._hourly_cache.get(symbol)
+        if entry is None:
+            return None
+        fetched_at, cached_start, cached_end, df = entry
+        if time.time() - fetched_at > self.HOURLY_CACHE_TTL or start_date < cached_start or end_date > cached_end:
+            return None
+        local_dates = df['datetime'].dt.tz_convert(EXCHANGE_TZ).dt.strftime('%Y-%m-%d')
+        return df[(local_dates >= start_date) & (local_dates <= end_date)].reset_index(drop=True)
+
+    def cached_hourly_range(self, symbol: str):
+        """(start_date, end_date) of the fresh cached hourly bars for `symbol`, or None."""
+        with self._cache_lock:
+            entry = self._hourly_cache.get(symbol)
+        if entry is None or time.time() - entry[0] > self.HOURLY_CACHE_TTL:
+            return None
+        return entry[1], entry[2]
+
+    def store_hourly_data(self, symbol: str, start_date: str, end_date: str, df: pd.DataFrame, fetched_at: float = None):
+        """Caches normalized hourly bars for `symbol` covering [start_date, end_date]."""
+        with self._cache_lock:
+            self._hourly_cache[symbol] = (fetched_at or time.time(), start_date, end_date, df.copy())
+
+    def prefetch_hourly_data(self, symbols, start_date: str, end_date: str = None, use_cache: bool = True) -> dict:
+        """
+        Fetches hourly data for many symbols in parallel, filling the shared cache.
+        Args:
+            symbols: Iterable of stock tickers
+            start_date: Start date 'YYYY-MM-DD'
+            end_date: End date 'YYYY-MM-DD' (default: today)
+            use_cache: Serve fresh cache entries (False re-downloads every symbol)
+        Returns:
+            dict mapping symbol -> pd.DataFrame (empty when every provider failed)
+        """
+        symbols = list(symbols)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as pool:
+            frames = pool.map(lambda s: self.fetch_hourly_data(s, start_date, end_date, use_cache=use_cache), symbols)
+            return dict(zip(symbols, frames))
+
+    def fetch_grouped_daily(self, date: str) -> pd.DataFrame:
+        """
+        Fetches one session's daily bars for the whole US market in a single Polygon call.
+        Args:
+            date: Session date 'YYYY-MM-DD'
+        Returns:
+            pd.DataFrame with columns: ticker, date, open, high, low, close, volume
+        """
+        with self._cache_lock:
+            cached = self._grouped_daily_cache.get(date)
+        if cached is not None:
+            return cached
+        url = f"https://api.polygon.io/v2/aggs/grouped/locale/us/market/stocks/{date}?adjusted=true&apiKey={self.API_KEYS['polygon']}"
+        resp = self._get(url)
         resp.raise_for_status()
-        results = resp.json().get('results', [])
+        df = pd.DataFrame(self._check_payload('polygon', resp.json()).get('results', []))
+        if df.empty:
+            return df
+        df = df[['T', 'o', 'h', 'l', 'c', 'v']]
+        df.columns = ['ticker', 'open', 'high', 'low', 'close', 'volume']
+        df['ticker'] = df['ticker'].str.replace('.', '-', regex=False)  # Match the share-class format of the S&P 500 list
+        df.insert(1, 'date', date)
+        # Today's session may still be forming; only completed sessions are cached
+        if date < datetime.today().strftime('%Y-%m-%d'):
+            with self._cache_lock:
+                self._grouped_daily_cache[date] = df
+        return df
+
+    def fetch_daily_snapshot(self, sessions: int = 30, end_date: str = None,
+                             deadline: float = None, cancel: threading.Event = None) -> pd.DataFrame:
+        """
+        Fetches the last `sessions` trading days of whole-market daily bars, one grouped
+        call per session (cached), instead of one call per ticker. Only completed sessions
+        are used: today's partial volume would be ranked against full-day baselines.
+        Rolling screens need consecutive sessions, so if any session fails or comes back
+        empty the whole snapshot is empty.
+        Args:
+            sessions: Number of completed trading sessions
+            end_date: Last date 'YYYY-MM-DD' (default: today)
+            deadline: Absolute time.time() after which no more requests are made
+            cancel: Event that stops the remaining requests when set
+        Returns:
+            pd.DataFrame with columns: ticker, date, open, high, low, close, volume
+        """
+        today = datetime.today().strftime('%Y-%m-%d')
+        if end_date is None:
+            end_date = today
+        start_date = (pd.Timestamp(end_date) - timedelta(days=sessions * 2 + 10)).strftime('%Y-%m-%d')
+        dates = [d.strftime('%Y-%m-%d') for d in trading_days(start_date, end_date)]
+        dates = [d for d in dates if d < today][-sessions:]
+
+        limited = self._limited(deadline, cancel)
+
+        def fetch(date):
+            try:
+                return limited.fetch_grouped_daily(date)
+            except Exception as e:
+                print(f"Grouped daily bars for {date} failed: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as pool:
+            frames = list(pool.map(fetch, dates))
+        missing = [d for d, f in zip(dates, frames) if f is None or f.empty]
+        if missing or not frames:
+            print(f"Daily snapshot incomplete ({len(missing)} of {len(dates)} sessions missing), skipping it")
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def fetch_sp500_tickers(self) -> list:
+        """
+        Fetches the current S&P 500 constituents from Wikipedia.
+        Returns:
+            list of tickers using '-' for share classes (e.g., 'BRK-B')
+        """
+        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        response = self._get(url, headers=headers)
+        response.raise_for_status()
+        tables = pd.read_html(io.StringIO(response.text))
+        tickers = tables[0]['Symbol'].tolist()
+        # Remove any invalid characters or formatting issues
+        return [ticker.replace('.', '-') for ticker in tickers]
+
+    def fetch_from_polygon(self, symbol, start_date, end_date):
+        url = f"https://api.polygon.io/v2/aggs/ticker/{symbol}/range/1/day/{start_date}/{end_date}?apiKey={self.API_KEYS['polygon']}&limit=50000"
+        results = self._polygon_results(url)
         df = pd.DataFrame(results)
         if df.empty:
             return df
@@ -103,9 +405,7 @@ class DataManager:
 
     def fetch_from_polygon_hourly(self, symbol, start_date, end_date):
         url = f"https://api.polygon.io/v2/aggs/ticker/{symbol}/range/1/hour/{start_date}/{end_date}?apiKey={self.API_KEYS['polygon']}&limit=50000"
-        resp = requests.get(url)
-        resp.raise_for_status()
-        results = resp.json().get('results', [])
+        results = self._polygon_results(url)
         df = pd.DataFrame(results)
         if df.empty:
             return df
@@ -115,10 +415,10 @@ class DataManager:
         return df
 
     def fetch_from_twelvedata(self, symbol, start_date, end_date):
-        url = f"https://api.twelvedata.com/time_series?symbol={symbol}&interval=1day&start_date={start_date}&end_date={end_date}&apikey={self.API_KEYS['twelvedata']}"
-        resp = requests.get(url)
+        url = f"https://api.twelvedata.com/time_series?symbol={symbol}&interval=1day&start_date={start_date}&end_date={end_date}&outputsize=5000&apikey={self.API_KEYS['twelvedata']}"
+        resp = self._get(url)
         resp.raise_for_status()
-        values = resp.json().get('values', [])
+        values = self._check_payload('twelvedata', resp.json()).get('values', [])
         df = pd.DataFrame(values)
         if df.empty:
             return df
@@ -127,19 +427,23 @@ class DataManager:
         return df
 
     def fetch_from_twelvedata_hourly(self, symbol, start_date, end_date):
-        url = f"https://api.twelvedata.com/time_series?symbol={symbol}&interval=1h&start_date={start_date}&end_date={end_date}&apikey={self.API_KEYS['twelvedata']}"
-        resp = requests.get(url)
-        resp.raise_for_status()
-        values = resp.json().get('values', [])
-        df = pd.DataFrame(values)
-        if df.empty:
-            return df
-        df = df[['datetime', 'open', 'high', 'low', 'close', 'volume']]
-        return df
+        def fetch_slice(window):
+            slice_start, slice_end = window
+            url = f"https://api.twelvedata.com/time_series?symbol={symbol}&interval=1h&start_date={slice_start}&end_date={slice_end}&outputsize=5000&apikey={self.API_KEYS['twelvedata']}"
+            resp = self._get(url)
+            resp.raise_for_status()
+            values = self._check_payload('twelvedata', resp.json()).get('values', [])
+            df = pd.DataFrame(values)
+            if df.empty:
+                return df
+            return df[['datetime', 'open', 'high', 'low', 'close', 'volume']]
+
+        slices = self._window_slices(start_date, end_date, self.TWELVEDATA_SLICE_DAYS)
+        return self._fetch_slices(fetch_slice, slices, 'datetime')
 
     def fetch_from_fmp(self, symbol, start_date, end_date):
         url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?from={start_date}&to={end_date}&apikey={self.API_KEYS['fmp']}"
-        resp = requests.get(url)
+        resp = self._get(url)
         resp.raise_for_status()
         historical = resp.json().get('historical', [])
         df = pd.DataFrame(historical)
@@ -150,7 +454,7 @@ class DataManager:
 
     def fetch_from_fmp_hourly(self, symbol, start_date, end_date):
         url = f"https://financialmodelingprep.com/api/v3/historical-chart/1hour/{symbol}?from={start_date}&to={end_date}&apikey={self.API_KEYS['fmp']}"
-        resp = requests.get(url)
+        resp = self._get(url)
         resp.raise_for_status()
         data = resp.json()
         df = pd.DataFrame(data)
@@ -161,10 +465,13 @@ class DataManager:
         return df
 
     def fetch_from_alpha_vantage(self, symbol, start_date, end_date):
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={self.API_KEYS['alpha_vantage']}&outputsize=full"
-        resp = requests.get(url)
+        # Only pull the full 20-year history when the range reaches past the compact window
+        recent = pd.Timestamp(start_date) >= pd.Timestamp.today().normalize() - timedelta(days=self.ALPHA_VANTAGE_COMPACT_DAYS)
+        outputsize = 'compact' if recent else 'full'
+        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={self.API_KEYS['alpha_vantage']}&outputsize={outputsize}"
+        resp = self._get(url)
         resp.raise_for_status()
-        data = resp.json().get('Time Series (Daily)', {})
+        data = self._check_payload('alpha_vantage', resp.json()).get('Time Series (Daily)', {})
         df = pd.DataFrame.from_dict(data, orient='index')
         if df.empty:
             return df
@@ -174,15 +481,21 @@ class DataManager:
         return df
 
     def fetch_from_alpha_vantage_hourly(self, symbol, start_date, end_date):
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=60min&outputsize=full&apikey={self.API_KEYS['alpha_vantage']}"
-        resp = requests.get(url)
-        resp.raise_for_status()
-        data = resp.json().get('Time Series (60min)', {})
-        df = pd.DataFrame.from_dict(data, orient='index')
+        def fetch_month(month):
+            url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=60min&month={month}&outputsize=full&apikey={self.API_KEYS['alpha_vantage']}"
+            resp = self._get(url)
+            resp.raise_for_status()
+            data = self._check_payload('alpha_vantage', resp.json()).get('Time Series (60min)', {})
+            df = pd.DataFrame.from_dict(data, orient='index')
+            if df.empty:
+                return df
+            df.reset_index(inplace=True)
+            df.columns = ['datetime', 'open', 'high', 'low', 'close', 'volume']
+            return df
+
+        df = self._fetch_slices(fetch_month, self._month_slices(start_date, end_date), 'datetime')
         if df.empty:
             return df
-        df.reset_index(inplace=True)
-        df.columns = ['datetime', 'open', 'high', 'low', 'close', 'volume']
         df['date'] = df['datetime'].str[:10]
         df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
         df.drop('date', axis=1, inplace=True)
@@ -190,7 +503,7 @@ class DataManager:
 
     def fetch_from_eodhd(self, symbol, start_date, end_date):
         url = f"https://eodhd.com/api/eod/{symbol}.US?from={start_date}&to={end_date}&api_token={self.API_KEYS['eodhd']}&fmt=json"
-        resp = requests.get(url)
+        resp = self._get(url)
         resp.raise_for_status()
         data = resp.json()
         df = pd.DataFrame(data)
@@ -201,7 +514,7 @@ class DataManager:
 
     def fetch_from_marketstack(self, symbol, start_date, end_date):
         url = f"http://api.marketstack.com/v1/eod?access_key={self.API_KEYS['marketstack']}&symbols={symbol}&date_from={start_date}&date_to={end_date}"
-        resp = requests.get(url)
+        resp = self._get(url)
         resp.raise_for_status()
         data = resp.json().get('data', [])
         df = pd.DataFrame(data)
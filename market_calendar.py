@@ -0,0 +1,150 @@
+# market_calendar.py
+from datetime import date, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+EXCHANGE_TZ = 'America/New_York'
+REGULAR_OPEN_HOUR = 9      # First hourly slot (09:00 bar contains the 09:30 open)
+REGULAR_CLOSE_HOUR = 16
+EARLY_CLOSE_HOUR = 13
+
+# One-off closures that do not follow the holiday rules (national days of mourning, etc.)
+SPECIAL_CLOSURES = {
+    date(2012, 10, 29), date(2012, 10, 30),  # Hurricane Sandy
+    date(2018, 12, 5),                        # President George H. W. Bush
+    date(2025, 1, 9),                         # President Jimmy Carter
+}
+
+
+def _nth_weekday(year, month, weekday, n):
+    """Return the n-th `weekday` (Mon=0) of a month; n=-1 gives the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    """Saturday holidays move to Friday, Sunday holidays to Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year):
+    """Full-day NYSE closures for a calendar year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),             # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),             # Washington's Birthday
+        _easter(year) - timedelta(days=2),       # Good Friday
+        _nth_weekday(year, 5, 0, -1),            # Memorial Day
+        _observed(date(year, 7, 4)),             # Independence Day
+        _nth_weekday(year, 9, 0, 1),             # Labor Day
+        _nth_weekday(year, 11, 3, 4),            # Thanksgiving
+        _observed(date(year, 12, 25)),           # Christmas
+    }
+    # New Year's Day is not moved back into the previous year when it falls on a Saturday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    holidays |= {d for d in SPECIAL_CLOSURES if d.year == year}
+    return frozenset(holidays)
+
+
+@lru_cache(maxsize=None)
+def nyse_early_closes(year):
+    """Sessions that close at 13:00 ET: July 3rd, the day after Thanksgiving and Christmas Eve."""
+    candidates = [
+        date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+        date(year, 12, 24),
+    ]
+    holidays = nyse_holidays(year)
+    return frozenset(d for d in candidates if d.weekday() < 5 and d not in holidays)
+
+
+@lru_cache(maxsize=64)
+def trading_days(start_date, end_date):
+    """
+    Trading sessions between two dates (inclusive).
+    Args:
+        start_date: Start date 'YYYY-MM-DD'
+        end_date: End date 'YYYY-MM-DD'
+    Returns:
+        pd.DatetimeIndex of session dates (tz-naive, midnight)
+    """
+    days = pd.bdate_range(start_date, end_date)
+    if days.empty:
+        return days
+    closed = set().union(*(nyse_holidays(year) for year in range(days.year.min(), days.year.max() + 1)))
+    return days[~days.isin(pd.DatetimeIndex(sorted(closed)))]
+
+
+@lru_cache(maxsize=64)
+def session_slots(start_date, end_date):
+    """
+    Regular-hours hourly bar slots between two dates, in UTC.
+
+    A slot is the start of an hourly bar that overlaps the regular session
+    (09:00-15:00 ET on normal days, 09:00-12:00 ET on early closes). Bars are
+    matched against it after flooring their timestamps to the hour, so both
+    hour-aligned (Polygon) and half-hour-aligned (TwelveData) bars line up.
+    Args:
+        start_date: Start date 'YYYY-MM-DD'
+        end_date: End date 'YYYY-MM-DD'
+    Returns:
+        pd.DatetimeIndex (UTC) of slot start times
+    """
+    days = trading_days(start_date, end_date)
+    if days.empty:
+        return pd.DatetimeIndex([], tz='UTC')
+    early = set().union(*(nyse_early_closes(year) for year in range(days.year.min(), days.year.max() + 1)))
+    close_hours = np.where(days.isin(pd.DatetimeIndex(sorted(early))), EARLY_CLOSE_HOUR, REGULAR_CLOSE_HOUR)
+
+    hours = np.arange(REGULAR_OPEN_HOUR, REGULAR_CLOSE_HOUR)
+    day_values = np.repeat(days.values, len(hours))
+    hour_values = np.tile(hours, len(days))
+    keep = hour_values < np.repeat(close_hours, len(hours))
+    local = pd.DatetimeIndex(day_values[keep]) + pd.to_timedelta(hour_values[keep], unit='h')
+    return local.tz_localize(EXCHANGE_TZ).tz_convert('UTC')
+
+
+def filter_session_bars(df, start_date=None, end_date=None):
+    """
+    Keep only the bars of a UTC-indexed frame that fall in a regular-session slot.
+    Args:
+        df: DataFrame indexed by tz-aware datetimes
+        start_date: Start date 'YYYY-MM-DD' (default: first bar)
+        end_date: End date 'YYYY-MM-DD' (default: last bar)
+    Returns:
+        Filtered DataFrame
+    """
+    if df.empty:
+        return df
+    local = df.index.tz_convert(EXCHANGE_TZ)
+    start_date = start_date or local.min().strftime('%Y-%m-%d')
+    end_date = end_date or local.max().strftime('%Y-%m-%d')
+    slots = session_slots(start_date, end_date)
+    return df[df.index.floor('h').isin(slots)]
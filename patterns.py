@@ -0,0 +1,149 @@
+# patterns.py
+import numpy as np
+import pandas as pd
+
+PATTERN_COLUMN = 'CANDLE_PATTERNS'
+
+# name -> (bit, side, detector); side is 'bullish', 'bearish' or 'neutral'
+PATTERNS = {}
+
+
+def register_pattern(name, side='neutral'):
+    """Register a detector `func(bars) -> bool array` under the next free bit of the pattern mask."""
+    def decorator(func):
+        if name in PATTERNS:
+            raise ValueError(f"Pattern {name!r} is already registered")
+        if len(PATTERNS) >= 31:
+            raise ValueError("The int32 pattern mask holds at most 31 patterns")
+        PATTERNS[name] = (len(PATTERNS), side, func)
+        return func
+    return decorator
+
+
+def _lag(x, periods):
+    out = np.full(len(x), np.nan)
+    if periods < len(x):
+        out[periods:] = x[:len(x) - periods]
+    return out
+
+
+class LaggedBars:
+    """OHLC arrays of the current bar and the two before it (o1 = open one bar back), computed once."""
+
+    def __init__(self, df):
+        self.o, self.h, self.l, self.c = (df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close'))
+        self.o1, self.h1, self.l1, self.c1 = (_lag(x, 1) for x in (self.o, self.h, self.l, self.c))
+        self.o2, self.c2 = _lag(self.o, 2), _lag(self.c, 2)
+        self.body = np.abs(self.c - self.o)
+        self.body1 = np.abs(self.c1 - self.o1)
+        self.lower_wick = np.minimum(self.o, self.c) - self.l
+        self.upper_wick = self.h - np.maximum(self.o, self.c)
+
+
+@register_pattern('Hammer', 'bullish')
+def _hammer(b):
+    return (b.lower_wick >= 2 * b.body) & (b.upper_wick <= 0.5 * b.body)
+
+
+@register_pattern('Bullish_Engulfing', 'bullish')
+def _bullish_engulfing(b):
+    return (b.c1 < b.o1) & (b.c > b.o) & (b.o < b.c1) & (b.c > b.o1)
+
+
+@register_pattern('Morning_Star', 'bullish')
+def _morning_star(b):
+    return (b.c2 < b.o2) & (b.body1 < 0.3 * (b.h1 - b.l1)) & (b.o1 < b.c2) & \
+           (b.c > b.o) & (b.c > (b.o2 + b.c2) / 2)
+
+
+@register_pattern('Shooting_Star', 'bearish')
+def _shooting_star(b):
+    return (b.upper_wick >= 2 * b.body) & (b.lower_wick <= 0.5 * b.body)
+
+
+@register_pattern('Bearish_Engulfing', 'bearish')
+def _bearish_engulfing(b):
+    return (b.c1 > b.o1) & (b.c < b.o) & (b.o > b.c1) & (b.c < b.o1)
+
+
+@register_pattern('Evening_Star', 'bearish')
+def _evening_star(b):
+    return (b.c2 > b.o2) & (b.body1 < 0.3 * (b.h1 - b.l1)) & (b.o1 > b.c2) & \
+           (b.c < b.o) & (b.c < (b.o2 + b.c2) / 2)
+
+
+@register_pattern('Doji')
+def _doji(b):
+    return (b.h > b.l) & (b.body <= 0.1 * (b.h - b.l))
+
+
+@register_pattern('Hanging_Man', 'bearish')
+def _hanging_man(b):
+    # Hammer shape at the top of an advance
+    return _hammer(b) & (b.c1 > b.o1) & (b.c1 > b.c2)
+
+
+@register_pattern('Three_White_Soldiers', 'bullish')
+def _three_white_soldiers(b):
+    return (b.c2 > b.o2) & (b.c1 > b.o1) & (b.c > b.o) & (b.c1 > b.c2) & (b.c > b.c1) & \
+           (b.o1 > b.o2) & (b.o1 < b.c2) & (b.o > b.o1) & (b.o < b.c1)
+
+
+@register_pattern('Three_Black_Crows', 'bearish')
+def _three_black_crows(b):
+    return (b.c2 < b.o2) & (b.c1 < b.o1) & (b.c < b.o) & (b.c1 < b.c2) & (b.c < b.c1) & \
+           (b.o1 < b.o2) & (b.o1 > b.c2) & (b.o < b.o1) & (b.o > b.c1)
+
+
+@register_pattern('Bullish_Harami', 'bullish')
+def _bullish_harami(b):
+    return (b.c1 < b.o1) & (b.c > b.o) & (b.o > b.c1) & (b.c < b.o1)
+
+
+@register_pattern('Bearish_Harami', 'bearish')
+def _bearish_harami(b):
+    return (b.c1 > b.o1) & (b.c < b.o) & (b.o < b.c1) & (b.c > b.o1)
+
+
+@register_pattern('Piercing_Line', 'bullish')
+def _piercing_line(b):
+    return (b.c1 < b.o1) & (b.o < b.c1) & (b.c > (b.o1 + b.c1) / 2) & (b.c < b.o1)
+
+
+@register_pattern('Dark_Cloud_Cover', 'bearish')
+def _dark_cloud_cover(b):
+    return (b.c1 > b.o1) & (b.o > b.c1) & (b.c < (b.o1 + b.c1) / 2) & (b.c > b.o1)
+
+
+def detect_patterns(df, names=None):
+    """
+    Evaluate registered patterns on OHLC bars.
+    Args:
+        df: DataFrame with open, high, low, close
+        names: patterns to evaluate (default: all registered)
+    Returns:
+        np.ndarray of int32 bitmasks, one per bar (bit = PATTERNS[name][0])
+    """
+    bars = LaggedBars(df)
+    mask = np.zeros(len(df), dtype=np.int32)
+    with np.errstate(invalid='ignore'):
+        for name in names or PATTERNS:
+            bit, _, func = PATTERNS[name]
+            mask |= func(bars).astype(np.int32) << bit
+    return mask
+
+
+def has_pattern(mask, name):
+    """Boolean array: bars whose mask has `name` set."""
+    return ((np.asarray(mask) >> PATTERNS[name][0]) & 1).astype(bool)
+
+
+def pattern_frame(df, names=None):
+    """Unpack the PATTERN_COLUMN of `df` into one boolean column per pattern (for display)."""
+    names = names or list(PATTERNS)
+    mask = df[PATTERN_COLUMN].to_numpy()
+    return pd.DataFrame({name: has_pattern(mask, name) for name in names}, index=df.index)
+
+
+def patterns_by_side(side):
+    return [name for name, (_, s, _) in PATTERNS.items() if s == side]
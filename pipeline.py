@@ -0,0 +1,83 @@
+# pipeline.py
+import hashlib
+import pandas as pd
+
+
+def frame_key(df):
+    """Content hash of a DataFrame (values and index), used to key source inputs."""
+    hashed = pd.util.hash_pandas_object(df, index=True).values
+    columns = ','.join(map(str, df.columns))
+    return hashlib.sha1(hashed.tobytes() + columns.encode()).hexdigest()
+
+
+class Node:
+    """
+    One stage of an IndicatorGraph.
+    Args:
+        name: Output name
+        func: Called as func(*input_outputs, **param_values)
+        inputs: Names of upstream nodes or sources
+        params: Names of the parameters the stage depends on
+    """
+
+    def __init__(self, name, func, inputs=(), params=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+
+
+class IndicatorGraph:
+    """
+    A DAG of stages with per-node memoization. A node's key hashes its own
+    parameter values and the keys of its inputs, so changing a parameter only
+    recomputes the nodes downstream of it; everything else is served from `cache`.
+    """
+
+    def __init__(self, nodes):
+        # Inputs that are not node names are sources, supplied to run()
+        names = {node.name for node in nodes}
+        self.nodes = {}
+        for node in nodes:
+            late = [i for i in node.inputs if i in names and i not in self.nodes]
+            if late:
+                raise ValueError(f"Node {node.name!r} is declared before its inputs: {late}")
+            self.nodes[node.name] = node
+
+    def run(self, sources, params, cache, targets=None):
+        """
+        Evaluate the graph.
+        Args:
+            sources: dict source name -> DataFrame
+            params: dict of parameter values
+            cache: dict node name -> (key, output), updated in place
+            targets: node names to compute (default: all)
+        Returns:
+            dict node name -> output for every node that was needed
+        """
+        keys = {name: frame_key(df) for name, df in sources.items()}
+        outputs = dict(sources)
+        needed = self._upstream(targets or list(self.nodes))
+        for name, node in self.nodes.items():
+            if name not in needed:
+                continue
+            material = repr((name, [keys[i] for i in node.inputs], [(p, params[p]) for p in node.params]))
+            key = hashlib.sha1(material.encode()).hexdigest()
+            cached = cache.get(name)
+            if cached is not None and cached[0] == key:
+                outputs[name] = cached[1]
+            else:
+                outputs[name] = node.func(*(outputs[i] for i in node.inputs), **{p: params[p] for p in node.params})
+                cache[name] = (key, outputs[name])
+            keys[name] = key
+        return outputs
+
+    def _upstream(self, targets):
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed or name not in self.nodes:
+                continue
+            needed.add(name)
+            stack.extend(self.nodes[name].inputs)
+        return needed
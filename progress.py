@@ -0,0 +1,70 @@
+# progress.py
+import time
+import pandas as pd
+import streamlit as st
+from market_calendar import EXCHANGE_TZ
+
+
+class ScanProgress:
+    """
+    Coalesced progress reporting for long scans. Per-ticker results are buffered
+    and the progress bar, status line and live results table are redrawn at most
+    once per `interval` seconds, so a 500-ticker scan sends a handful of UI
+    updates instead of one toast and one progress message per ticker.
+
+    Completed tickers are screened in batches at each flush with `screen`
+    (dict ticker -> DataFrame to list of signaling tickers), and the signaling
+    ones stream into a sortable table as they are found.
+    """
+
+    TABLE_COLUMNS = ['股票', '时间', '收盘价', 'MFI', 'MFI梯度', '20HR MA', '成交量']
+
+    def __init__(self, total, screen, interval=0.5):
+        self.total = total
+        self.screen = screen
+        self.interval = interval
+        self.done = 0
+        self.failed = {}  # ticker -> error message
+        self.signaling_tickers = []
+        self._pending = {}
+        self._rows = []
+        self._last_flush = 0.0
+        self._bar = st.progress(0.0)
+        self._status = st.empty()
+        self._table = st.empty()
+
+    def ticker_done(self, ticker, data=None, error=None):
+        """Record one finished ticker: its analyzed data, or the error that stopped it."""
+        self.done += 1
+        if error is not None:
+            self.failed[ticker] = error
+        elif data is not None and not data.empty:
+            self._pending[ticker] = data
+        if time.time() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Screen buffered tickers and redraw the progress widgets."""
+        if self._pending:
+            for ticker in self.screen(self._pending):
+                self.signaling_tickers.append(ticker)
+                self._rows.append(self._row(ticker, self._pending[ticker]))
+            self._pending = {}
+        self._bar.progress(self.done / self.total if self.total else 1.0)
+        status = f"已处理 {self.done}/{self.total} 股票 | 信号: {len(self.signaling_tickers)}"
+        if self.failed:
+            status += f" | 失败: {len(self.failed)}"
+        self._status.caption(status)
+        if self._rows:
+            self._table.dataframe(pd.DataFrame(self._rows, columns=self.TABLE_COLUMNS), hide_index=True, use_container_width=True)
+        self._last_flush = time.time()
+
+    def finish(self):
+        self.flush()
+
+    def _row(self, ticker, df):
+        latest = df.iloc[-1]
+        ts = df.index[-1]
+        ts = ts.tz_convert(EXCHANGE_TZ) if getattr(ts, 'tz', None) is not None else ts
+        return [ticker, ts.strftime('%Y-%m-%d %H:%M'), latest['close'], latest.get('INDC_MFI'),
+                latest.get('INDC_MFI_SLOPE'), latest.get('INDC_20HR_MA'), latest['volume']]
@@ -0,0 +1,69 @@
+# resample.py
+import numpy as np
+import pandas as pd
+from market_calendar import EXCHANGE_TZ
+
+TIMEFRAMES = ('4h', '1D', '1W')
+SESSION_ANCHOR_MINUTES = 9 * 60 + 30  # 4-hour buckets start at the 09:30 open
+
+
+def _bar_minutes(index):
+    """Length of the source bars, taken as the smallest spacing between consecutive bars."""
+    if len(index) < 2:
+        return 60
+    step = (index[1:] - index[:-1]).min() / pd.Timedelta(minutes=1)
+    return int(min(max(step, 1), 60))
+
+
+def _session_keys(index, timeframe):
+    """Label each bar with the start of the higher-timeframe bucket it belongs to (exchange time)."""
+    local = index.tz_convert(EXCHANGE_TZ)
+    session_date = local.normalize()
+    if timeframe == '1D':
+        return session_date
+    if timeframe == '1W':
+        return session_date - pd.to_timedelta(session_date.dayofweek, unit='D')
+    if timeframe == '4h':
+        # Bars are bucketed from the open so each session splits into 09:30-13:30 and 13:30-16:00;
+        # a bar belongs to the bucket its last minute falls into, so the 09:00 hourly slot opens the day.
+        last_minute = (local.hour * 60 + local.minute).values + _bar_minutes(index) - 1
+        offset = np.maximum(last_minute - SESSION_ANCHOR_MINUTES, 0) // 240
+        return session_date + pd.to_timedelta(SESSION_ANCHOR_MINUTES + offset * 240, unit='m')
+    raise ValueError(f"Unsupported timeframe: {timeframe} (expected one of {TIMEFRAMES})")
+
+
+def resample_bars(df, timeframe):
+    """
+    Derives higher-timeframe OHLCV bars from session-filtered hourly or minute bars.
+    Args:
+        df: DataFrame indexed by tz-aware datetimes with open, high, low, close, volume
+        timeframe: '4h', '1D' or '1W'
+    Returns:
+        pd.DataFrame indexed by bucket start (UTC) with open, high, low, close, volume
+        and `last_bar`, the timestamp of the latest source bar in each bucket
+    """
+    if df.empty:
+        return pd.DataFrame(columns=['open', 'high', 'low', 'close', 'volume', 'last_bar'])
+    keys = _session_keys(df.index, timeframe)
+    grouped = df.groupby(keys.tz_convert('UTC'), sort=True)
+    bars = grouped.agg(open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+                       close=('close', 'last'), volume=('volume', 'sum'))
+    bars['last_bar'] = grouped.apply(lambda g: g.index[-1])
+    bars.index.name = 'datetime'
+    return bars
+
+
+def align_to_source(higher, source_index, columns):
+    """
+    Maps higher-timeframe values back onto the source bars without look-ahead:
+    each source bar sees the values of the latest higher-timeframe bar whose
+    last source bar is at or before it.
+    Args:
+        higher: DataFrame produced from resample_bars (must keep `last_bar`)
+        source_index: tz-aware DatetimeIndex of the source bars
+        columns: columns of `higher` to carry over
+    Returns:
+        pd.DataFrame indexed like `source_index`
+    """
+    values = higher.set_index('last_bar')[columns].sort_index()
+    return values.reindex(source_index, method='ffill')
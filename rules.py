@@ -0,0 +1,349 @@
+# rules.py
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from patterns import PATTERN_COLUMN, PATTERNS, has_pattern
+
+# Short names usable in rules for the indicator columns
+ALIASES = {
+    'MFI': 'INDC_MFI',
+    'MFI_SLOPE': 'INDC_MFI_SLOPE',
+    'MA20': 'INDC_20HR_MA',
+    'MA50': 'INDC_50HR_MA',
+    'OBV': 'INDC_OBV',
+    # Higher-timeframe indicators (see MTF_TIMEFRAMES in whr_backend.py)
+    **{f'{short}_{tf}': f'{column}_{tf}' for tf in ('4h', '1D')
+       for short, column in (('MFI', 'INDC_MFI'), ('MFI_SLOPE', 'INDC_MFI_SLOPE'), ('MA20', 'INDC_20_MA'), ('MA50', 'INDC_50_MA'))},
+}
+# Candlestick pattern names (e.g. Hammer) resolve to bits of the PATTERN_COLUMN mask
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|([^\W\d]\w*)|(<=|>=|==|!=|[<>+\-*/(),]))")
+_KEYWORDS = {'and', 'or', 'not'}
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ValueError(f"Unexpected character at {pos} in rule: {text!r}")
+        number, name, op = match.groups()
+        if number is not None:
+            tokens.append(('num', float(number)))
+        elif name is not None:
+            tokens.append(('kw', name) if name in _KEYWORDS else ('name', name))
+        else:
+            tokens.append(('op', op))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser producing hashable tuple nodes:
+    ('num', v), ('name', n), ('call', fn, args), ('bin', op, a, b), ('not', a), ('neg', a)
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self, kind=None, value=None):
+        token = self._peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValueError(f"Expected {value or kind} at token {self.pos} in rule: {self.text!r}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected token {self._peek()[1]!r} in rule: {self.text!r}")
+        return node
+
+    def _or(self):
+        node = self._and()
+        while self._peek() == ('kw', 'or'):
+            self.pos += 1
+            node = ('bin', 'or', node, self._and())
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self._peek() == ('kw', 'and'):
+            self.pos += 1
+            node = ('bin', 'and', node, self._not())
+        return node
+
+    def _not(self):
+        if self._peek() == ('kw', 'not'):
+            self.pos += 1
+            return ('not', self._not())
+        return self._comparison()
+
+    def _comparison(self):
+        node = self._arith()
+        kind, value = self._peek()
+        if kind == 'op' and value in ('<', '<=', '>', '>=', '==', '!='):
+            self.pos += 1
+            node = ('bin', value, node, self._arith())
+        return node
+
+    def _arith(self):
+        node = self._term()
+        while self._peek() in (('op', '+'), ('op', '-')):
+            op = self._take()[1]
+            node = ('bin', op, node, self._term())
+        return node
+
+    def _term(self):
+        node = self._unary()
+        while self._peek() in (('op', '*'), ('op', '/')):
+            op = self._take()[1]
+            node = ('bin', op, node, self._unary())
+        return node
+
+    def _unary(self):
+        if self._peek() == ('op', '-'):
+            self.pos += 1
+            return ('neg', self._unary())
+        return self._atom()
+
+    def _atom(self):
+        kind, value = self._peek()
+        if kind == 'num':
+            self.pos += 1
+            return ('num', value)
+        if kind == 'name':
+            self.pos += 1
+            if self._peek() == ('op', '('):
+                self.pos += 1
+                args = [self._or()]
+                while self._peek() == ('op', ','):
+                    self.pos += 1
+                    args.append(self._or())
+                self._take('op', ')')
+                if value not in _FUNCTIONS:
+                    raise ValueError(f"Unknown function {value!r} in rule: {self.text!r}")
+                return ('call', value, tuple(args))
+            return ('name', value)
+        if (kind, value) == ('op', '('):
+            self.pos += 1
+            node = self._or()
+            self._take('op', ')')
+            return node
+        raise ValueError(f"Unexpected token {value!r} in rule: {self.text!r}")
+
+
+@lru_cache(maxsize=256)
+def parse_rule(text):
+    """Parse a rule expression into its (hashable) syntax tree."""
+    return _Parser(text).parse()
+
+
+def _names(node):
+    if node[0] == 'name':
+        return {node[1]}
+    if node[0] == 'call':
+        return set().union(*(_names(a) for a in node[2]))
+    if node[0] == 'bin':
+        return _names(node[2]) | _names(node[3])
+    if node[0] in ('not', 'neg'):
+        return _names(node[1])
+    return set()
+
+
+def _as_float(x):
+    return x.astype(float) if isinstance(x, np.ndarray) and x.dtype == bool else x
+
+
+def _truth(x):
+    if isinstance(x, np.ndarray) and x.dtype == bool:
+        return x
+    return np.nan_to_num(np.asarray(x, dtype=float)) != 0
+
+
+def _window(value):
+    if isinstance(value, np.ndarray):
+        raise ValueError("Window and shift lengths must be numbers or parameters")
+    window = int(value)
+    if window < 1:
+        raise ValueError(f"Window must be positive, got {window}")
+    return window
+
+
+def _rolling(reducer):
+    def apply(ctx, x, window):
+        window = _window(window)
+        x = np.asarray(_as_float(x), dtype=float)
+        padded = np.concatenate([np.full(window - 1, np.nan), x])
+        out = reducer(sliding_window_view(padded, window), axis=1)
+        out[ctx.position < window - 1] = np.nan  # Windows must not cross into the previous ticker
+        return out
+    return apply
+
+
+def _shift(ctx, x, periods):
+    periods = _window(periods)
+    x = np.asarray(_as_float(x), dtype=float)
+    out = np.full(len(x), np.nan)
+    out[periods:] = x[:-periods]
+    out[ctx.position < periods] = np.nan
+    return out
+
+
+_FUNCTIONS = {
+    'rolling_min': _rolling(np.min),
+    'rolling_max': _rolling(np.max),
+    'rolling_mean': _rolling(np.mean),
+    'rolling_sum': _rolling(np.sum),
+    'shift': _shift,
+    'abs': lambda ctx, x: np.abs(_as_float(x)),
+}
+
+_BINARY = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal,
+}
+
+
+class _Context:
+    """Column arrays, parameters and per-row position within its ticker for one evaluation."""
+
+    def __init__(self, columns, params, position):
+        self.columns = columns
+        self.params = params
+        self.position = position
+        self.memo = {}
+
+    def lookup(self, name):
+        if name in self.params:
+            return self.params[name]
+        if name in self.columns:
+            return self.columns[name]
+        if name in ALIASES and ALIASES[name] in self.columns:
+            return self.columns[ALIASES[name]]
+        if name in PATTERNS and PATTERN_COLUMN in self.columns:
+            return has_pattern(self.columns[PATTERN_COLUMN], name)
+        raise KeyError(f"Unknown name in rule: {name!r}")
+
+    def evaluate(self, node):
+        # Identical subtrees (e.g. shift(close, 1) or rolling_min(MFI, 5)) are computed once per pass
+        if node in self.memo:
+            return self.memo[node]
+        kind = node[0]
+        if kind == 'num':
+            value = node[1]
+        elif kind == 'name':
+            value = self.lookup(node[1])
+        elif kind == 'call':
+            value = _FUNCTIONS[node[1]](self, *(self.evaluate(a) for a in node[2]))
+        elif kind == 'not':
+            value = ~_truth(self.evaluate(node[1]))
+        elif kind == 'neg':
+            value = -_as_float(self.evaluate(node[1]))
+        elif node[1] == 'and':
+            value = _truth(self.evaluate(node[2])) & _truth(self.evaluate(node[3]))
+        elif node[1] == 'or':
+            value = _truth(self.evaluate(node[2])) | _truth(self.evaluate(node[3]))
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                value = _BINARY[node[1]](_as_float(self.evaluate(node[2])), _as_float(self.evaluate(node[3])))
+        self.memo[node] = value
+        return value
+
+
+class RuleSet:
+    """
+    Named rule expressions compiled into vectorized NumPy evaluation, e.g.
+    RuleSet({'MFI超卖反弹': 'rolling_min(MFI, signal_window) < 30 and MFI_SLOPE >= slope_threshold'}).
+
+    Rules are evaluated in order and may reference earlier rules by name. Shared
+    subexpressions across all rules are evaluated once per pass.
+    """
+
+    def __init__(self, rules):
+        self.rules = dict(rules)
+        self.trees = {name: parse_rule(text) for name, text in self.rules.items()}
+        names = set().union(*(_names(tree) for tree in self.trees.values())) - set(self.rules)
+        self.columns = names | {ALIASES[n] for n in names if n in ALIASES}  # Parameters are filtered out at lookup
+        if names & set(PATTERNS):
+            self.columns.add(PATTERN_COLUMN)  # Candlestick patterns are read from the bitmask
+
+    def _evaluate(self, columns, params, position):
+        ctx = _Context(columns, params, position)
+        results = {}
+        for name, tree in self.trees.items():
+            value = ctx.evaluate(tree)
+            if not isinstance(value, np.ndarray):
+                value = np.full(len(position), value)
+            results[name] = _truth(value)
+            ctx.columns[name] = results[name]
+        return results
+
+    def evaluate(self, df, params=None):
+        """
+        Evaluate all rules on one ticker's frame.
+        Returns:
+            pd.DataFrame of boolean rule results indexed like `df`
+        """
+        columns = {c: df[c].to_numpy() for c in self.columns if c in df.columns}
+        results = self._evaluate(columns, params or {}, np.arange(len(df)))
+        return pd.DataFrame(results, index=df.index)
+
+    def evaluate_universe(self, frames, params=None):
+        """
+        Evaluate all rules on many tickers in one vectorized pass over their stacked rows.
+        Args:
+            frames: dict ticker -> DataFrame
+            params: dict of parameter values referenced by the rules
+        Returns:
+            dict ticker -> pd.DataFrame of boolean rule results
+        """
+        frames = {t: df for t, df in frames.items() if not df.empty}
+        if not frames:
+            return {}
+        lengths = np.array([len(df) for df in frames.values()])
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        position = np.arange(lengths.sum()) - starts
+        present = set.intersection(*(set(df.columns) for df in frames.values()))
+        columns = {c: np.concatenate([df[c].to_numpy() for df in frames.values()]) for c in self.columns if c in present}
+        results = self._evaluate(columns, params or {}, position)
+
+        out, offset = {}, 0
+        for (ticker, df), n in zip(frames.items(), lengths):
+            out[ticker] = pd.DataFrame({k: v[offset:offset + n] for k, v in results.items()}, index=df.index)
+            offset += n
+        return out
+
+    def validate(self, columns, params=None):
+        """
+        Check the rules against the columns they will run on before any data exists:
+        unknown names, wrong argument counts and bad windows raise ValueError.
+        Args:
+            columns: Column names available at evaluation time
+            params: dict of parameter values referenced by the rules
+        """
+        params = params or {}
+        columns = set(columns)
+        for name, tree in self.trees.items():
+            for ref in _names(tree) - set(self.rules) - set(params):
+                known = ref in columns or (ref in ALIASES and ALIASES[ref] in columns) or \
+                        (ref in PATTERNS and PATTERN_COLUMN in columns)
+                if not known:
+                    raise ValueError(f"Unknown name {ref!r} in rule {name!r}: {self.rules[name]!r}")
+        # A dry run on a few placeholder rows catches errors the parser cannot see
+        dummy = {c: np.zeros(3, dtype=np.int32 if c == PATTERN_COLUMN else float) for c in self.columns if c in columns}
+        try:
+            with np.errstate(all='ignore'):
+                self._evaluate(dummy, params, np.arange(3))
+        except (TypeError, KeyError) as e:
+            raise ValueError(f"Invalid rule: {e}") from e
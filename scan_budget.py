@@ -0,0 +1,76 @@
+# scan_budget.py
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SCAN_WORKERS = 8  # Tickers in flight at once; each may fetch its own slices in parallel
+
+
+class ScanBudget:
+    """
+    Time limits for one scan: a global deadline for the whole universe and a
+    per-ticker limit, both absolute `time.time()` values handed to the fetchers.
+    Setting `cancel` stops outstanding work cooperatively: fetchers check it
+    before every request.
+    """
+
+    def __init__(self, total_seconds=None, ticker_seconds=None):
+        self.started_at = time.time()
+        self.deadline = self.started_at + total_seconds if total_seconds else None
+        self.ticker_seconds = ticker_seconds
+        self.cancel = threading.Event()
+
+    def remaining(self):
+        """Seconds left before the global deadline (None when unbounded)."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.time())
+
+    def expired(self):
+        return self.cancel.is_set() or (self.deadline is not None and time.time() >= self.deadline)
+
+    def ticker_deadline(self):
+        """Deadline for a ticker starting now: its own limit, capped by the global deadline."""
+        limits = [d for d in (self.deadline, time.time() + self.ticker_seconds if self.ticker_seconds else None) if d is not None]
+        return min(limits) if limits else None
+
+
+def run_budgeted(items, work, budget, on_result, max_workers=SCAN_WORKERS):
+    """
+    Run `work(item, deadline, cancel)` for every item on a thread pool within `budget`.
+    `on_result(item, result, error)` is called on the calling thread as items finish,
+    so it may update the UI. When the global deadline passes, queued items are
+    cancelled, running ones are told to stop, and the scan returns without waiting
+    for them.
+    Args:
+        items: Items to process (e.g. tickers)
+        work: Callable (item, deadline, cancel) -> result
+        budget: ScanBudget
+        on_result: Callable (item, result, error); error is an exception or None
+        max_workers: Pool size
+    Returns:
+        list of items that did not finish, in input order
+    """
+    def run(item):
+        if budget.expired():
+            raise TimeoutError("Scan deadline reached before start")
+        return work(item, budget.ticker_deadline(), budget.cancel)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {pool.submit(run, item): item for item in items}
+    pending = set(futures)
+    unfinished = []
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=budget.remaining(), return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if isinstance(error, TimeoutError) and budget.expired():
+                    unfinished.append(futures[future])  # Stopped by the global deadline, not by its own limit
+                else:
+                    on_result(futures[future], None if error else future.result(), error)
+            if pending and budget.expired():
+                break
+    finally:
+        budget.cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    unfinished = set(unfinished) | {futures[f] for f in pending}
+    return [item for item in items if item in unfinished]
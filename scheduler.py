@@ -0,0 +1,52 @@
+# scheduler.py
+import hashlib
+import pandas as pd
+from market_calendar import EXCHANGE_TZ, session_slots
+
+BAR_INTERVAL = pd.Timedelta(hours=1)
+
+
+class RefreshScheduler:
+    """
+    Schedules refreshes just after hourly bars close during regular sessions.
+    Nights, weekends, holidays and the time after early closes are skipped: the
+    next refresh after the last bar of a session is the first bar close of the
+    next session.
+    """
+
+    def __init__(self, delay_seconds=90, horizon_days=10):
+        self.delay = pd.Timedelta(seconds=delay_seconds)  # Gives providers time to publish the closed bar
+        self.horizon_days = horizon_days
+
+    def bar_closes(self, now):
+        """UTC close times of the session bars from today through the scheduling horizon."""
+        local = now.tz_convert(EXCHANGE_TZ)
+        start = local.strftime('%Y-%m-%d')
+        end = (local + pd.Timedelta(days=self.horizon_days)).strftime('%Y-%m-%d')
+        return session_slots(start, end) + BAR_INTERVAL
+
+    def next_refresh(self, now=None):
+        """
+        Next refresh time strictly after `now`.
+        Args:
+            now: tz-aware timestamp (default: current time)
+        Returns:
+            pd.Timestamp (UTC)
+        """
+        now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now).tz_convert('UTC')
+        times = self.bar_closes(now) + self.delay
+        upcoming = times[times > now]
+        if upcoming.empty:
+            raise RuntimeError(f"No trading session within {self.horizon_days} days of {now}")
+        return upcoming[0]
+
+
+def bar_fingerprint(bars):
+    """
+    Identifies the latest state of a ticker's bars: the last bar's timestamp plus a
+    hash of its values, so revised or still-forming bars count as changes.
+    """
+    if bars is None or bars.empty:
+        return None
+    last = bars.iloc[-1][['open', 'high', 'low', 'close', 'volume']].astype(float)
+    return bars.index[-1], len(bars), hashlib.sha1(last.to_numpy().tobytes()).hexdigest()
@@ -0,0 +1,109 @@
+# screening.py
+import math
+import numpy as np
+import pandas as pd
+from data import DataManager
+
+SNAPSHOT_SESSIONS = 30  # Enough daily bars for the 20-day MA, 14-day MFI and volume baseline
+VOLUME_BASELINE = 5
+
+
+def daily_features(daily):
+    """
+    Cheap daily screens for every ticker in a long daily frame, computed on wide
+    (date x ticker) panels in one pass.
+    Args:
+        daily: DataFrame with columns ticker, date, open, high, low, close, volume
+    Returns:
+        pd.DataFrame indexed by ticker with volume_expansion, ma_distance and mfi
+    """
+    panel = daily.pivot_table(index='date', columns='ticker', values=['high', 'low', 'close', 'volume']).sort_index()
+    high, low, close, volume = panel['high'], panel['low'], panel['close'], panel['volume']
+
+    # Latest volume against the average of the sessions before it
+    baseline = volume.shift(1).rolling(VOLUME_BASELINE).mean()
+    volume_expansion = volume.iloc[-1] / baseline.iloc[-1]
+
+    # Distance of the close from its 20-day MA (the hourly pipeline looks for closes within 3% of the MA)
+    ma20 = close.rolling(20).mean()
+    ma_distance = (close.iloc[-1] / ma20.iloc[-1] - 1).abs()
+
+    # Daily MFI(14): low values sit in the oversold zone the hourly MFI rebound rule looks for
+    typical = (high + low + close) / 3
+    flow = typical * volume
+    change = typical.diff()
+    positive = flow.where(change > 0, 0).rolling(14).sum()
+    negative = flow.where(change < 0, 0).rolling(14).sum()
+    mfi = 100 - 100 / (1 + positive / (negative + 1e-10))
+
+    return pd.DataFrame({
+        'volume_expansion': volume_expansion,
+        'ma_distance': ma_distance,
+        'mfi': mfi.iloc[-1],
+    })
+
+
+def rank_universe(features):
+    """
+    Combine the screens into one score (mean percentile rank; higher is more promising):
+    stronger volume expansion, closer to the 20-day MA and lower daily MFI rank first.
+    """
+    ranks = pd.DataFrame({
+        'volume_expansion': features['volume_expansion'].rank(pct=True),
+        'ma_distance': features['ma_distance'].rank(pct=True, ascending=False),
+        'mfi': features['mfi'].rank(pct=True, ascending=False),
+    })
+    ranked = features.assign(score=ranks.mean(axis=1, skipna=True))
+    return ranked.sort_values('score', ascending=False)
+
+
+def cached_daily_bars(tickers):
+    """Daily bars derived from already-cached hourly bars (no API calls), in snapshot format."""
+    manager = DataManager()
+    frames = []
+    for ticker in tickers:
+        cached_range = manager.cached_hourly_range(ticker)
+        if cached_range is None:
+            continue
+        bars = manager.fetch_resampled_data(ticker, *cached_range, timeframe='1D')
+        if not bars.empty:
+            frames.append(bars.assign(ticker=ticker))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def prefilter_universe(tickers, keep_fraction=0.2, min_keep=25, daily=None, deadline=None, cancel=None):
+    """
+    Stage one of the screening funnel: rank the universe on a bulk daily snapshot
+    (or daily bars derived from cached hourly bars) and keep only the top
+    candidates for the full hourly pipeline. Tickers with no daily data cannot be
+    ranked and are always kept, so a failed snapshot falls back to scanning
+    everything.
+    Args:
+        tickers: Universe to screen
+        keep_fraction: Share of the ranked universe to keep (higher = better recall, more cost)
+        min_keep: Lower bound on the number of ranked tickers kept
+        daily: Optional long daily frame to use instead of fetching a snapshot
+        deadline: Absolute time.time() after which the snapshot stops fetching
+        cancel: Event that stops the snapshot fetch when set
+    Returns:
+        (candidates, ranking): candidate tickers in ranked order, and the ranking DataFrame
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if daily is None:
+        daily = DataManager().fetch_daily_snapshot(SNAPSHOT_SESSIONS, deadline=deadline, cancel=cancel)
+    daily = daily[daily['ticker'].isin(tickers)] if not daily.empty else daily
+    # Tickers missing from the snapshot can still be ranked from cached hourly bars
+    covered = set() if daily.empty else set(daily['ticker'])
+    missing = [t for t in tickers if t not in covered]
+    daily = pd.concat([daily, cached_daily_bars(missing)], ignore_index=True)
+    if daily.empty:
+        return tickers, pd.DataFrame()
+
+    features = daily_features(daily).replace([np.inf, -np.inf], np.nan).dropna(how='all')
+    ranking = rank_universe(features)
+
+    keep = min(len(ranking), max(min_keep, math.ceil(len(ranking) * keep_fraction)))
+    unranked = [t for t in tickers if t not in ranking.index]
+    return list(ranking.index[:keep]) + unranked, ranking
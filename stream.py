@@ -0,0 +1,290 @@
+# stream.py
+import json
+import os
+import threading
+import time
+import pandas as pd
+from market_calendar import EXCHANGE_TZ, session_slots
+
+
+class HourlyBarBuilder:
+    """
+    Builds regular-session hourly bars from trade ('T') and aggregate ('A'/'AM')
+    events. Each event updates the bar of its hour slot; an event in a later slot
+    completes the symbol's previous bar.
+    """
+
+    def __init__(self):
+        self.bars = {}  # symbol -> dict(slot, open, high, low, close, volume)
+        self._slots = {}  # session date -> set of UTC slot starts
+
+    def _in_session(self, slot):
+        day = slot.tz_convert(EXCHANGE_TZ).strftime('%Y-%m-%d')
+        if day not in self._slots:
+            self._slots[day] = set(session_slots(day, day))
+        return slot in self._slots[day]
+
+    def on_event(self, event):
+        """
+        Apply one normalized event.
+        Args:
+            event: dict with sym, t (epoch ms), o, h, l, c, v
+        Returns:
+            list of (symbol, bar Series, completed) tuples produced by the event
+        """
+        ts = pd.Timestamp(event['t'], unit='ms', tz='UTC')
+        slot = ts.floor('h')
+        if not self._in_session(slot):
+            return []
+        symbol = event['sym']
+        out = []
+        bar = self.bars.get(symbol)
+        if bar is not None and slot > bar['slot']:
+            out.append((symbol, self._to_series(bar), True))
+            bar = None
+        elif bar is not None and slot < bar['slot']:
+            return []  # Late event for a bar that was already completed
+        if bar is None:
+            bar = {'slot': slot, 'open': event['o'], 'high': event['h'], 'low': event['l'], 'close': event['c'], 'volume': 0.0}
+            self.bars[symbol] = bar
+        bar['high'] = max(bar['high'], event['h'])
+        bar['low'] = min(bar['low'], event['l'])
+        bar['close'] = event['c']
+        bar['volume'] += event['v']
+        out.append((symbol, self._to_series(bar), False))
+        return out
+
+    def flush(self, now):
+        """Complete every open bar whose hour has ended by `now` (UTC)."""
+        out = []
+        for symbol, bar in list(self.bars.items()):
+            if bar['slot'] + pd.Timedelta(hours=1) <= now:
+                out.append((symbol, self._to_series(bar), True))
+                del self.bars[symbol]
+        return out
+
+    @staticmethod
+    def _to_series(bar):
+        return pd.Series({k: float(bar[k]) for k in ('open', 'high', 'low', 'close', 'volume')}, name=bar['slot'])
+
+
+def normalize_polygon_event(message):
+    """Map a Polygon websocket message to the builder's event format, or None for status messages."""
+    ev = message.get('ev')
+    if ev == 'T':
+        price = message['p']
+        return {'sym': message['sym'], 't': message['t'], 'o': price, 'h': price, 'l': price, 'c': price, 'v': message.get('s', 0)}
+    if ev in ('A', 'AM'):
+        return {'sym': message['sym'], 't': message['s'], 'o': message['o'], 'h': message['h'], 'l': message['l'], 'c': message['c'], 'v': message['v']}
+    return None
+
+
+class StreamError(Exception):
+    """The stream cannot continue (e.g. rejected credentials); reconnecting would not help."""
+
+
+class PolygonStreamSource:
+    """
+    Minute aggregates (or trades) from the Polygon stocks websocket. Dropped
+    connections and transient status errors (e.g. max_connections) are retried
+    with exponential backoff; `last_error` describes the current problem and is
+    cleared once a connection is authenticated again. Rejected credentials raise
+    StreamError.
+    """
+
+    URL = 'wss://socket.polygon.io/stocks'
+    realtime = True
+    RECONNECT_MIN = 1  # Seconds before the first reconnect, doubled per failure
+    RECONNECT_MAX = 60
+    HANDSHAKE_TIMEOUT = 10
+
+    def __init__(self, symbols, api_key=None, channel='AM'):
+        self.symbols = list(symbols)
+        self.api_key = api_key or os.getenv('POLYGON_KEY', 'tG46_YlaJWzQJ5CaxgG_pGNdsp7ueXsc')
+        self.channel = channel
+        self.last_error = None
+
+    @staticmethod
+    def _check_status(message):
+        """Raise for Polygon status messages that mean the connection is unusable."""
+        status = message.get('status')
+        if status == 'auth_failed':
+            raise StreamError(f"Polygon authentication failed: {message.get('message')}")
+        if status in ('max_connections', 'error'):
+            raise ConnectionError(f"Polygon {status}: {message.get('message')}")
+
+    def _authenticate(self, ws):
+        ws.send(json.dumps({'action': 'auth', 'params': self.api_key}))
+        deadline = time.time() + self.HANDSHAKE_TIMEOUT
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise ConnectionError("Polygon did not confirm authentication")
+            for message in json.loads(ws.recv(timeout=remaining)):
+                if message.get('ev') == 'status':
+                    self._check_status(message)
+                    if message.get('status') == 'auth_success':
+                        return
+
+    def events(self, stop_event):
+        from websockets.sync.client import connect
+
+        delay = self.RECONNECT_MIN
+        while not stop_event.is_set():
+            try:
+                with connect(self.URL, open_timeout=self.HANDSHAKE_TIMEOUT) as ws:
+                    self._authenticate(ws)
+                    params = ','.join(f'{self.channel}.{s}' for s in self.symbols)
+                    ws.send(json.dumps({'action': 'subscribe', 'params': params}))
+                    self.last_error = None
+                    delay = self.RECONNECT_MIN
+                    while not stop_event.is_set():
+                        try:
+                            raw = ws.recv(timeout=1)
+                        except TimeoutError:
+                            yield None  # Lets the ingestor close bars on time without new events
+                            continue
+                        for message in json.loads(raw):
+                            if message.get('ev') == 'status':
+                                self._check_status(message)
+                                continue
+                            event = normalize_polygon_event(message)
+                            if event is not None:
+                                yield event
+            except StreamError as e:
+                self.last_error = str(e)
+                raise
+            except Exception as e:
+                # Dropped socket, refused connection or transient status error: back off and reconnect
+                self.last_error = f"Connection lost ({e}); reconnecting in {delay}s"
+                print(f"Polygon stream: {self.last_error}")
+            # Keep yielding heartbeats while waiting, so bars still close on time
+            resume_at = time.time() + delay
+            while not stop_event.is_set() and time.time() < resume_at:
+                stop_event.wait(min(1, resume_at - time.time()))
+                yield None
+            delay = min(delay * 2, self.RECONNECT_MAX)
+
+
+class ReplaySource:
+    """
+    Replays Polygon-style websocket messages from a JSON-lines file (one message
+    or list of messages per line). `speed` > 0 replays in scaled real time,
+    0 replays as fast as possible.
+    """
+
+    realtime = False
+
+    def __init__(self, path, speed=0.0):
+        self.path = path
+        self.speed = speed
+
+    def events(self, stop_event):
+        last_t = None
+        with open(self.path) as f:
+            for line in f:
+                if stop_event.is_set():
+                    return
+                line = line.strip()
+                if not line:
+                    continue
+                messages = json.loads(line)
+                for message in messages if isinstance(messages, list) else [messages]:
+                    event = normalize_polygon_event(message)
+                    if event is None:
+                        continue
+                    if self.speed > 0 and last_t is not None and event['t'] > last_t:
+                        time.sleep((event['t'] - last_t) / 1000 / self.speed)
+                    last_t = event['t']
+                    yield event
+
+
+class LiveIngestor:
+    """
+    Consumes a stream source in a background thread, builds hourly bars for the
+    watchlist and pushes them into the given MarketAnalyzers. Completed bars are
+    analyzed immediately; in-progress updates at most every `update_interval` seconds
+    per symbol.
+    """
+
+    def __init__(self, analyzers, source, update_interval=5.0):
+        self.analyzers = analyzers
+        self.source = source
+        self.update_interval = update_interval
+        self.builder = HourlyBarBuilder()
+        self.version = 0  # Bumped whenever an analyzer changes
+        self._clock = pd.Timestamp(0, tz='UTC')
+        self.last_error = None
+        self._last_update = {}
+        self._dirty = set()  # Symbols with throttled in-progress updates not yet analyzed
+        self.lock = threading.Lock()  # Held while analyzers are being updated
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _push(self, symbol, bar, completed):
+        analyzer = self.analyzers.get(symbol)
+        if analyzer is None:
+            return
+        now = time.time()
+        with self.lock:
+            analyzer.update_bars(bar.to_frame().T)
+            if not completed and now - self._last_update.get(symbol, 0) < self.update_interval:
+                self._dirty.add(symbol)
+                return
+            self._analyze(symbol, now)
+
+    def _analyze(self, symbol, now):
+        """Re-run the analyzer of `symbol` on its merged bars; call with `lock` held."""
+        analyzer = self.analyzers[symbol]
+        self._dirty.discard(symbol)
+        self._last_update[symbol] = now
+        analyzer.analyze(**analyzer.params)
+        self.version += 1
+
+    def _flush_dirty(self, force=False):
+        """
+        Analyze throttled updates whose interval has passed (all of them with force=True),
+        so the last update of a quiet symbol or of a finished source is not lost.
+        """
+        now = time.time()
+        with self.lock:
+            for symbol in list(self._dirty):
+                if force or now - self._last_update.get(symbol, 0) >= self.update_interval:
+                    try:
+                        self._analyze(symbol, now)
+                    except Exception as e:
+                        self._dirty.discard(symbol)
+                        self.last_error = f"{symbol}: {e}"
+
+    def _run(self):
+        try:
+            for event in self.source.events(self._stop):
+                updates = self.builder.on_event(event) if event is not None else []
+                if event is not None:
+                    self._clock = max(self._clock, pd.Timestamp(event['t'], unit='ms', tz='UTC'))
+                # Live sources close bars on the wall clock, replays on the replayed event time
+                now = pd.Timestamp.now(tz='UTC') if self.source.realtime else self._clock
+                updates += self.builder.flush(now)
+                for symbol, bar, completed in updates:
+                    try:
+                        self._push(symbol, bar, completed)
+                    except Exception as e:
+                        self.last_error = f"{symbol}: {e}"
+                if event is None:
+                    self._flush_dirty()
+            # Source exhausted (end of a replay or a closed connection)
+            self._flush_dirty(force=True)
+        except Exception as e:
+            self.last_error = str(e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='live-ingest', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
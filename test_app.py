@@ -9,7 +9,7 @@ st.title("Stock Data Fetcher Tester")
 symbol = st.text_input("Stock Symbol", value="AAPL")
 start_date = st.date_input("Start Date", value=datetime(2023, 1, 1))
 end_date = st.date_input("End Date", value=datetime.today())
-timeframe = st.selectbox("Timeframe", ["Daily", "Hourly"])
+timeframe = st.selectbox("Timeframe", ["Daily", "Hourly", "4-Hour (resampled)", "Daily (resampled)", "Weekly (resampled)"])
 mode = st.selectbox("Mode", ["Fallback", "Individual"])
 
 provider = None
@@ -32,6 +32,10 @@ if st.button("Fetch Data"):
                 df = fetch_func(symbol, start_str, end_str)
                 if df.empty:
                     st.write(f"No data fetched from {provider}")
+        elif timeframe.endswith("(resampled)"):
+            resample_rule = {"4-Hour": "4h", "Daily": "1D", "Weekly": "1W"}[timeframe.split(" ")[0]]
+            st.write(f"Deriving {resample_rule} bars from hourly data")
+            df = dm.fetch_resampled_data(symbol, start_str, end_str, resample_rule)
         else:  # Hourly
             if mode == "Fallback":
                 df = dm.fetch_hourly_data(symbol, start_str, end_str)
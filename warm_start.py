@@ -0,0 +1,160 @@
+# warm_start.py
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from data import DataManager
+from whr_backend import MarketAnalyzer, DEFAULT_PARAMS
+
+WARM_LOOKBACK_DAYS = 30
+WARM_REFRESH_MINUTES = 30
+SNAPSHOT_PATH = os.getenv('WARM_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.warm_cache', 'snapshot.pkl'))
+
+
+class WarmStartService:
+    """
+    Keeps the S&P 500 universe warm: constituent list, recent hourly bars in the
+    DataManager cache and default-parameter analyzers, refreshed on a schedule.
+
+    Run `python warm_start.py` at server boot to prime a snapshot on disk once; the
+    dashboard loads that snapshot on startup and is the only process that keeps
+    refreshing it.
+    """
+
+    def __init__(self, lookback_days=WARM_LOOKBACK_DAYS, refresh_minutes=WARM_REFRESH_MINUTES, snapshot_path=SNAPSHOT_PATH):
+        self.lookback_days = lookback_days
+        self.refresh_minutes = refresh_minutes
+        self.snapshot_path = snapshot_path
+        self.tickers = []
+        self.start_date = None
+        self.end_date = None
+        self.analyzers = {}
+        self.updated_at = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def date_range(self):
+        """The (start, end) date strings the warm state covers if refreshed now."""
+        end = datetime.today()
+        start = end - timedelta(days=self.lookback_days)
+        return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+    def refresh(self):
+        """Refresh constituents, prefetch hourly bars and precompute default analyzers."""
+        manager = DataManager()
+        try:
+            tickers = manager.fetch_sp500_tickers()
+        except Exception as e:
+            print(f"Warm start: failed to refresh S&P 500 list: {e}")
+            tickers = self.tickers
+        if not tickers:
+            return 'Warm start skipped: no tickers.'
+
+        start_date, end_date = self.date_range()
+        # Bypass the cache so each refresh really pulls new bars; the analyzers below read the refreshed entries
+        manager.prefetch_hourly_data(tickers, start_date, end_date, use_cache=False)
+
+        def build(ticker):
+            try:
+                analyzer = MarketAnalyzer()
+                analyzer.fetch_data(ticker, start_date, end_date)
+                if analyzer.data.empty:
+                    return ticker, None
+                analyzer.analyze(**DEFAULT_PARAMS)
+                return ticker, analyzer
+            except Exception as e:
+                print(f"Warm start: {ticker} failed: {e}")
+                return ticker, None
+
+        with ThreadPoolExecutor(max_workers=manager.MAX_WORKERS) as pool:
+            analyzers = {t: a for t, a in pool.map(build, tickers) if a is not None}
+
+        with self._lock:
+            self.tickers = tickers
+            self.start_date, self.end_date = start_date, end_date
+            self.analyzers = analyzers
+            self.updated_at = time.time()
+        self.save_snapshot()
+        return f'Warm start refreshed {len(analyzers)}/{len(tickers)} tickers.'
+
+    def get_analyzer(self, ticker, start_date, end_date):
+        """
+        Return a private copy of the warm analyzer for `ticker` if it was built for the
+        same date range. Its node cache holds the default-parameter results, so
+        analyze() with other parameters only recomputes the affected stages.
+        """
+        with self._lock:
+            if (start_date, end_date) != (self.start_date, self.end_date) or ticker not in self.analyzers:
+                return None
+            return self.analyzers[ticker].copy()
+
+    def save_snapshot(self):
+        """Persist the warm state and the hourly bar cache so another process can start warm."""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            state = {
+                'tickers': self.tickers,
+                'start_date': self.start_date,
+                'end_date': self.end_date,
+                'analyzers': self.analyzers,
+                'updated_at': self.updated_at,
+            }
+        with DataManager._cache_lock:
+            state['hourly_cache'] = dict(DataManager._hourly_cache)
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def load_snapshot(self):
+        """Load a snapshot written by a previous refresh if it is recent enough to be useful."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"Warm start: could not read snapshot: {e}")
+            return False
+        if time.time() - state['updated_at'] > self.refresh_minutes * 60 * 2:
+            return False
+        manager = DataManager()
+        for symbol, (fetched_at, start_date, end_date, df) in state['hourly_cache'].items():
+            manager.store_hourly_data(symbol, start_date, end_date, df, fetched_at=fetched_at)
+        with self._lock:
+            self.tickers = state['tickers']
+            self.start_date, self.end_date = state['start_date'], state['end_date']
+            self.analyzers = state['analyzers']
+            self.updated_at = state['updated_at']
+        return True
+
+    def _run(self):
+        if time.time() - self.updated_at < self.refresh_minutes * 60:
+            self._stop.wait(self.updated_at + self.refresh_minutes * 60 - time.time())
+        while not self._stop.is_set():
+            try:
+                print(self.refresh())
+            except Exception as e:
+                print(f"Warm start refresh failed: {e}")
+            self._stop.wait(self.refresh_minutes * 60)
+
+    def start(self):
+        """Load any snapshot and start the background refresh loop."""
+        if self._thread is not None:
+            return
+        self.load_snapshot()
+        self._thread = threading.Thread(target=self._run, name='warm-start', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    # Prime the snapshot once; the dashboard's in-process service does the periodic refreshes
+    print(WarmStartService().refresh())
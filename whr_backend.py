@@ -1,32 +1,122 @@
 # whr_backend.py
+import copy
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from data import DataManager
+from market_calendar import EXCHANGE_TZ, filter_session_bars
+from resample import resample_bars, align_to_source
+from rules import RuleSet
+from pipeline import IndicatorGraph, Node
+from patterns import PATTERN_COLUMN, detect_patterns, pattern_frame, patterns_by_side
+
+# Default slider values of the dashboard; analyses run with these can be served from warm state
+DEFAULT_PARAMS = {
+    'mfi_period': 14,
+    'mfi_slope_window': 3,
+    'volume_multiplier': 2.0,
+    'signal_window': 5,
+    'slope_threshold': 1.0,
+    'lookback_window': 3,
+    'price_change_lookback': 3,
+    'price_change_threshold': 5.0,
+}
+
+# Flag rules computed by generate_flags; see rules.py for the expression language
+FLAG_RULES = RuleSet({
+    '均线支持': 'close >= MA20 * 0.97 and close <= MA20 * 1.03 and MA20 > MA50',
+    'MFI超卖反弹': 'rolling_min(MFI, signal_window) < 30 and MFI_SLOPE >= slope_threshold',
+    'MFI超买回落': 'rolling_max(MFI, signal_window) > 70 and MFI_SLOPE < -slope_threshold',
+    'MFI顶背离': 'close > shift(close, 1) and MFI < shift(MFI, 1) and MFI > 70',
+    'OBV熊背离': 'close > shift(close, 1) and OBV < shift(OBV, 1)',
+    '价格上涨': '(close / shift(close, price_change_lookback) - 1) * 100 > price_change_threshold',
+    '成交量增加': 'volume > shift(volume, 1)',
+})
+
+# Columns shown in the buy and sell heatmaps
+BUY_SIGNALS = ['均线支持', 'MFI超卖反弹', 'Hammer', 'Morning_Star', 'Bullish_Engulfing', 'Volume_Surge', '价格上涨']
+SELL_SIGNALS = ['MFI超买回落', 'OBV熊背离', 'Shooting_Star', 'Evening_Star', 'Bearish_Engulfing', 'Volume_Surge', 'MFI顶背离']
+
+# Screening rule on the latest bar: at least 3 of the 4 buy conditions
+SCREEN_RULE = 'MFI超卖反弹 + 均线支持 + Volume_Surge + 成交量增加 >= 3'
+
+# Higher timeframes whose MFI and MAs analyze() adds to every hourly bar (see calculate_mtf_indicators)
+MTF_TIMEFRAMES = ('4h', '1D')
+
+def mtf_columns(timeframe):
+    """Hourly indicator column -> its higher-timeframe column name."""
+    return {
+        'INDC_MFI': f'INDC_MFI_{timeframe}',
+        'INDC_MFI_SLOPE': f'INDC_MFI_SLOPE_{timeframe}',
+        'INDC_20HR_MA': f'INDC_20_MA_{timeframe}',
+        'INDC_50HR_MA': f'INDC_50_MA_{timeframe}',
+    }
+
+# Columns of an analyzed frame that screening rules may reference
+SCREEN_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'INDC_MFI', 'INDC_MFI_SLOPE', 'INDC_20HR_MA', 'INDC_50HR_MA',
+                  'INDC_OBV', PATTERN_COLUMN, 'Volume_Surge', *FLAG_RULES.rules,
+                  *(c for tf in MTF_TIMEFRAMES for c in mtf_columns(tf).values())]
+
+def screen_universe(frames, rule=SCREEN_RULE):
+    """
+    Evaluate a screening rule for every ticker in one vectorized pass and keep
+    the tickers where it holds on the latest bar.
+    Args:
+        frames: dict ticker -> analyzed DataFrame
+        rule: rule expression over the flag and indicator columns
+    Returns:
+        list of signaling tickers, in input order
+    """
+    results = RuleSet({'signal': rule}).evaluate_universe(frames)
+    return [t for t, res in results.items() if res['signal'].iloc[-1]]
+
+def validate_screen_rule(rule):
+    """Raise ValueError if `rule` does not parse or references unknown columns, before any scan runs."""
+    RuleSet({'signal': rule}).validate(SCREEN_COLUMNS)
+
+def signal_diff(previous, current):
+    """
+    Compare two lists of signaling tickers.
+    Returns:
+        dict with sorted 'new', 'disappeared' and 'stable' ticker lists
+    """
+    prev, curr = set(previous), set(current)
+    return {
+        'new': sorted(curr - prev),
+        'disappeared': sorted(prev - curr),
+        'stable': sorted(curr & prev),
+    }
 
 class MarketAnalyzer:
     def __init__(self):
         self.data = []
+        self.bars = pd.DataFrame()  # Session-filtered source bars, kept for resampling and live updates
+        self.params = dict(DEFAULT_PARAMS)
+        self.graph_cache = {}  # INDICATOR_GRAPH node outputs, reused across analyze() calls
+        self.fetch_range = None
+
+    def copy(self):
+        """Copy with its own node cache; frames are never modified in place, so they are shared."""
+        other = copy.copy(self)
+        other.params = dict(self.params)
+        other.graph_cache = dict(self.graph_cache)
+        return other
 
-    def fetch_data(self, ticker, start_date, end_date):
+    def fetch_data(self, ticker, start_date, end_date, use_cache=True, deadline=None, cancel=None):
+        self.fetch_range = (ticker, start_date, end_date)
         manager = DataManager()
-        self.data = manager.fetch_hourly_data(ticker, start_date, end_date)
+        self.data = manager.fetch_hourly_data(ticker, start_date, end_date, use_cache=use_cache, deadline=deadline, cancel=cancel)
 
         numeric_cols = ['open', 'high', 'low', 'close', 'volume']
         self.data[numeric_cols] = self.data[numeric_cols].apply(pd.to_numeric, errors='coerce')
         self.data = self.data.dropna(subset=numeric_cols)
         
-        self.data['datetime'] = pd.to_datetime(self.data['datetime'])
+        self.data['datetime'] = pd.to_datetime(self.data['datetime'], utc=True)
         self.data.set_index('datetime', inplace=True)
-        # Filter for hours between 13:00 and 19:00
-        self.data = self.data[self.data.index.hour.isin(range(13, 20))]
-        # Remove non-trading days (days with no trading activity, i.e., total volume == 0)
-        self.data['date'] = self.data.index.date
-        daily_volume = self.data.groupby('date')['volume'].sum()
-        trading_days = daily_volume[daily_volume > 0].index
-        self.data = self.data[self.data['date'].isin(trading_days)]
-        self.data = self.data.drop(columns=['date'])
+        # Keep regular-session bars only (NYSE calendar, DST-aware, holidays and early closes excluded)
+        self.data = filter_session_bars(self.data, start_date, end_date)
+        self.bars = self.data.copy()
     
     def show_data(self):
         """Display the first few rows of the stored data sequence."""
@@ -84,96 +174,86 @@ class MarketAnalyzer:
         self.data = df
         return '20-hour MA calculated.'
     
-    def calculate_candle_patterns(self, volume_multiplier=2.0):
+    def update_bars(self, bars):
+        """
+        Merge new or updated bars (UTC-indexed OHLCV rows) into the source bars,
+        replacing any existing bar with the same timestamp. Call analyze() afterwards.
+        """
+        bars = bars[['open', 'high', 'low', 'close', 'volume']].astype(float)
+        kept = self.bars[~self.bars.index.isin(bars.index)]
+        self.bars = pd.concat([kept, bars]).sort_index()
+        self.bars.index.name = 'datetime'
+
+    def resample(self, timeframe):
+        """Derive '4h', '1D' or '1W' OHLCV bars from the fetched bars (no extra API calls)."""
+        return resample_bars(self.bars, timeframe)
+
+    def calculate_mtf_indicators(self, timeframe='1D', period=14, slope_window=3):
+        """
+        Calculate MFI and moving averages on resampled bars and join them onto the
+        current data as INDC_MFI_<tf>, INDC_MFI_SLOPE_<tf>, INDC_20_MA_<tf> and INDC_50_MA_<tf>.
+        Each bar only sees higher-timeframe values known at its close; early rows stay
+        NaN until enough higher bars exist. analyze() runs this for MTF_TIMEFRAMES.
+        """
+        higher = MarketAnalyzer()
+        higher.data = self.resample(timeframe)
+        if len(higher.data) > period:
+            higher.calculate_mfi(period=period, slope_window=slope_window)
+        else:
+            higher.data = higher.data.assign(INDC_MFI=np.nan, INDC_MFI_SLOPE=np.nan)
+        higher.calculate_ma()
+        columns = mtf_columns(timeframe)
+        aligned = align_to_source(higher.data, self.data.index, list(columns)).rename(columns=columns)
+        self.data = self.data.drop(columns=list(columns.values()), errors='ignore').join(aligned)
+        return f'{timeframe} indicators calculated.'
+
+    def calculate_candle_patterns(self):
+        """Detect all registered candlestick patterns into one bitmask column (see patterns.py)."""
         df = self.data.copy()
-        
-        df['body'] = abs(df['close'] - df['open'])
-        df['lower_wick'] = df[['open', 'close']].min(axis=1) - df['low']
-        df['upper_wick'] = df['high'] - df[['open', 'close']].max(axis=1)
-        df['Hammer'] = (df['lower_wick'] >= 2 * df['body']) & (df['upper_wick'] <= 0.5 * df['body'])
-        
-        df['Bullish_Engulfing'] = (df['close'].shift(1) < df['open'].shift(1)) & \
-                                  (df['close'] > df['open']) & \
-                                  (df['open'] < df['close'].shift(1)) & \
-                                  (df['close'] > df['open'].shift(1))
-        
-        df['Morning_Star'] = (df['close'].shift(2) < df['open'].shift(2)) & \
-                             (abs(df['close'].shift(1) - df['open'].shift(1)) < 0.3 * (df['high'].shift(1) - df['low'].shift(1))) & \
-                             (df['open'].shift(1) < df['close'].shift(2)) & \
-                             (df['close'] > df['open']) & \
-                             (df['close'] > (df['open'].shift(2) + df['close'].shift(2)) / 2)
-        
-        df['Shooting_Star'] = (df['upper_wick'] >= 2 * df['body']) & (df['lower_wick'] <= 0.5 * df['body'])
-        
-        df['Bearish_Engulfing'] = (df['close'].shift(1) > df['open'].shift(1)) & \
-                                  (df['close'] < df['open']) & \
-                                  (df['open'] > df['close'].shift(1)) & \
-                                  (df['close'] < df['open'].shift(1))
-        
-        df['Evening_Star'] = (df['close'].shift(2) > df['open'].shift(2)) & \
-                             (abs(df['close'].shift(1) - df['open'].shift(1)) < 0.3 * (df['high'].shift(1) - df['low'].shift(1))) & \
-                             (df['open'].shift(1) > df['close'].shift(2)) & \
-                             (df['close'] < df['open']) & \
-                             (df['close'] < (df['open'].shift(2) + df['close'].shift(2)) / 2)
-        
-        df['prev_avg_vol'] = df['volume'].shift(1).rolling(3).mean()
-        df['Volume_Surge'] = df['volume'] > volume_multiplier * df['prev_avg_vol']
-        
-        df = df.drop(['body', 'lower_wick', 'upper_wick', 'prev_avg_vol'], axis=1)
-        
+        df[PATTERN_COLUMN] = detect_patterns(df)
         self.data = df.dropna()
         return 'Candle patterns calculated.'
+
+    def calculate_volume_surge(self, volume_multiplier=2.0):
+        df = self.data.copy()
+        prev_avg_vol = df['volume'].shift(1).rolling(3).mean()
+        df['Volume_Surge'] = df['volume'] > volume_multiplier * prev_avg_vol
+        self.data = df
+        return 'Volume surge calculated.'
     
+    def analyze(self, mfi_period=14, mfi_slope_window=3, volume_multiplier=2.0, signal_window=5, slope_threshold=1.0,
+                lookback_window=3, price_change_lookback=3, price_change_threshold=5.0):
+        """
+        Run the full indicator and flag pipeline on the fetched bars. Stages run
+        through INDICATOR_GRAPH, so only those affected by changed bars or
+        parameters since the last call are recomputed.
+        """
+        self.params = dict(mfi_period=mfi_period, mfi_slope_window=mfi_slope_window, volume_multiplier=volume_multiplier,
+                           signal_window=signal_window, slope_threshold=slope_threshold, lookback_window=lookback_window,
+                           price_change_lookback=price_change_lookback, price_change_threshold=price_change_threshold)
+        bars = self.bars if not self.bars.empty else self.data
+        self.data = INDICATOR_GRAPH.run({'bars': bars}, self.params, self.graph_cache, targets=['analysis'])['analysis']
+        return 'Analysis completed.'
+
     def drop(self):
         self.data = self.data.dropna()
         return 'Indicators calculated and data updated.'
     
     def generate_flags(self, signal_window=5, slope_threshold=1.0, lookback_window=3, price_change_lookback=3, price_change_threshold=5.0):
         df = self.data.copy()
-        df['均线支持'] = np.where(
-            (df['close'] >= df['INDC_20HR_MA'] * 0.97) & (df['close'] <= df['INDC_20HR_MA'] * 1.03) &
-            (df['INDC_20HR_MA'] > df['INDC_50HR_MA']),
-            True, False
-        )
-
-        df['MFI超卖反弹'] = np.where(
-            (df['INDC_MFI'].rolling(window=signal_window).min() < 30) & 
-            (df['INDC_MFI_SLOPE'] >= slope_threshold),
-            True, False
-        )
-
-        df['MFI超买回落'] = np.where(
-            (df['INDC_MFI'].rolling(window=signal_window).max() > 70) & 
-            (df['INDC_MFI_SLOPE'] < -slope_threshold),
-            True, False
-        )
-
-        df['MFI顶背离'] = np.where(
-            (df['close'] > df['close'].shift(1)) & 
-            (df['INDC_MFI'] < df['INDC_MFI'].shift(1)) &
-            (df['INDC_MFI'] > 70),
-            True, False
-        )
-
-        df['OBV熊背离'] = np.where(
-            (df['close'] > df['close'].shift(1)) & 
-            (df['INDC_OBV'] < df['INDC_OBV'].shift(1)),
-            True, False
-        )
-
-        df['价格上涨'] = np.where(
-            ((df['close'] / df['close'].shift(price_change_lookback) - 1) * 100 > price_change_threshold),
-            True, False
-        )
-
-        df['成交量增加'] = df['volume'] > df['volume'].shift(1)
-
+        params = dict(signal_window=signal_window, slope_threshold=slope_threshold, lookback_window=lookback_window,
+                      price_change_lookback=price_change_lookback, price_change_threshold=price_change_threshold)
+        flags = FLAG_RULES.evaluate(df, params)
+        df[flags.columns] = flags
         self.data = df.dropna()
 
     def create_figures(self, df):
         # Columns needed for the heatmaps
-        buy_cols = ['均线支持', 'MFI超卖反弹', 'Hammer', 'Morning_Star', 'Bullish_Engulfing', 'Volume_Surge', '价格上涨']
-        sell_cols = ['MFI超买回落', 'OBV熊背离', 'Shooting_Star', 'Evening_Star', 'Bearish_Engulfing', 'Volume_Surge', 'MFI顶背离']
+        buy_cols = BUY_SIGNALS
+        sell_cols = SELL_SIGNALS
+        # Candlestick patterns are stored as a bitmask; unpack them for display
+        if PATTERN_COLUMN in df.columns:
+            df = df.join(pattern_frame(df).drop(columns=df.columns, errors='ignore'))
         if not all(col in df.columns for col in buy_cols + sell_cols):
             missing = set(buy_cols + sell_cols) - set(df.columns)
             raise ValueError(f"Missing columns: {missing}")
@@ -182,7 +262,10 @@ class MarketAnalyzer:
         x_idx = np.arange(len(df))
         # Keep readable time in hover (if index is datetime-like)
         try:
-            time_str = pd.to_datetime(df.index).strftime('%Y-%m-%d %H:%M')
+            times = pd.to_datetime(df.index)
+            if times.tz is not None:
+                times = times.tz_convert(EXCHANGE_TZ)
+            time_str = times.strftime('%Y-%m-%d %H:%M')
         except Exception:
             # Fallback in case index is not datetime-like
             time_str = df.index.astype(str)
@@ -230,7 +313,7 @@ class MarketAnalyzer:
         )
 
         # Add red upward arrows for bullish candle patterns
-        bullish_mask = df['Hammer'] | df['Morning_Star'] | df['Bullish_Engulfing']
+        bullish_mask = df[patterns_by_side('bullish')].any(axis=1)
         bullish_indices = np.where(bullish_mask)[0]
         for i in bullish_indices:
             fig_candle.add_annotation(
@@ -363,4 +446,49 @@ class MarketAnalyzer:
             showlegend=True,
         )
 
-        return fig_candle, fig_multi
\ No newline at end of file
+        return fig_candle, fig_multi
+
+
+def _stage(method, columns=None, **param_names):
+    """Graph node running one MarketAnalyzer method; `param_names` maps method arguments to parameters."""
+    def run(df, **params):
+        analyzer = MarketAnalyzer()
+        analyzer.data = df
+        getattr(analyzer, method)(**{arg: params[name] for arg, name in param_names.items()})
+        return analyzer.data[columns] if columns else analyzer.data
+    return run
+
+def _join_indicators(bars, *parts):
+    return bars.join(list(parts)).dropna()
+
+def _mtf_stage(timeframe):
+    """Graph node computing the higher-timeframe indicators of `timeframe` on the source bars."""
+    def run(bars, mfi_period, mfi_slope_window):
+        analyzer = MarketAnalyzer()
+        analyzer.bars = analyzer.data = bars
+        analyzer.calculate_mtf_indicators(timeframe, period=mfi_period, slope_window=mfi_slope_window)
+        return analyzer.data[list(mtf_columns(timeframe).values())]
+    return run
+
+def _join_mtf(flags, *parts):
+    # Joined after the dropna of the hourly stages: higher-timeframe columns are NaN until enough bars exist
+    return flags.join(list(parts))
+
+# Every stage reads the source bars directly, so e.g. a new volume_multiplier only reruns volume_surge -> indicators -> flags
+INDICATOR_GRAPH = IndicatorGraph([
+    Node('mfi', _stage('calculate_mfi', ['INDC_MFI', 'INDC_MFI_SLOPE'], period='mfi_period', slope_window='mfi_slope_window'),
+         inputs=['bars'], params=['mfi_period', 'mfi_slope_window']),
+    Node('ma', _stage('calculate_ma', ['INDC_20HR_MA', 'INDC_50HR_MA']), inputs=['bars']),
+    Node('obv', _stage('calculate_obv', ['INDC_OBV']), inputs=['bars']),
+    Node('candles', _stage('calculate_candle_patterns', [PATTERN_COLUMN]), inputs=['bars']),
+    Node('volume_surge', _stage('calculate_volume_surge', ['Volume_Surge'], volume_multiplier='volume_multiplier'),
+         inputs=['bars'], params=['volume_multiplier']),
+    Node('indicators', _join_indicators, inputs=['bars', 'mfi', 'ma', 'obv', 'candles', 'volume_surge']),
+    Node('flags', _stage('generate_flags', signal_window='signal_window', slope_threshold='slope_threshold',
+                         lookback_window='lookback_window', price_change_lookback='price_change_lookback',
+                         price_change_threshold='price_change_threshold'),
+         inputs=['indicators'],
+         params=['signal_window', 'slope_threshold', 'lookback_window', 'price_change_lookback', 'price_change_threshold']),
+    *(Node(f'mtf_{tf}', _mtf_stage(tf), inputs=['bars'], params=['mfi_period', 'mfi_slope_window']) for tf in MTF_TIMEFRAMES),
+    Node('analysis', _join_mtf, inputs=['flags', *(f'mtf_{tf}' for tf in MTF_TIMEFRAMES)]),
+])
@@ -1,11 +1,16 @@
 # whr_frontend.py
 import streamlit as st
-from whr_backend import MarketAnalyzer
+from whr_backend import MarketAnalyzer, screen_universe, signal_diff, validate_screen_rule, SCREEN_RULE
 from data import DataManager
-from datetime import datetime
+from warm_start import WarmStartService
+from stream import LiveIngestor, PolygonStreamSource, ReplaySource
+from progress import ScanProgress
+from scheduler import RefreshScheduler, bar_fingerprint
+from screening import prefilter_universe
+from api_server import RESULTS, start_api_server
+from scan_budget import ScanBudget, run_budgeted
+from datetime import datetime, timedelta
 import pandas as pd
-import requests
-import io
 import time
 
 if 'analyzers' not in st.session_state:
@@ -20,6 +25,10 @@ if 'show_dropdown' not in st.session_state:
     st.session_state.show_dropdown = True
 if 'last_run_time' not in st.session_state:
     st.session_state.last_run_time = 0
+if 'live_ingestor' not in st.session_state:
+    st.session_state.live_ingestor = None
+    st.session_state.live_key = None
+    st.session_state.live_version = 0
 
 st.title("美股技术指标分析")
 
@@ -60,28 +69,41 @@ st.markdown("""
 # Add info about auto-scaling feature in main content
 st.info("📊 提示: K线图支持自动Y轴缩放 - 使用鼠标框选或拖动底部滑块时，Y轴会自动调整以适配可见数据范围")
 
+# Warm-start service: one per server process, primes S&P 500 data before users arrive
+@st.cache_resource
+def get_warm_service():
+    service = WarmStartService()
+    service.start()
+    return service
+
+warm_service = get_warm_service()
+
+# Read-only results API for other services, one per server process
+@st.cache_resource
+def get_api_server():
+    try:
+        return start_api_server()
+    except OSError as e:
+        print(f"Results API not started: {e}")
+        return None
+
+get_api_server()
+
 # Function to get S&P 500 tickers
 @st.cache_data(ttl=3600)  # Cache for 1 hour
-def get_sp500_tickers():
+def scrape_sp500_tickers():
     """Fetch S&P 500 tickers from Wikipedia with proper headers"""
     try:
-        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        tables = pd.read_html(io.StringIO(response.text))
-        sp500_table = tables[0]
-        tickers = sp500_table['Symbol'].tolist()
-        # Remove any invalid characters or formatting issues
-        tickers = [ticker.replace('.', '-') for ticker in tickers]
-        return tickers
+        return DataManager().fetch_sp500_tickers()
     except Exception as e:
         st.error(f"Failed to fetch S&P 500 list: {e}")
         # Fallback to a smaller sample if web scraping fails
         return ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'TSLA', 'META', 'BRK-B', 'JPM', 'UNH']
 
+def get_sp500_tickers():
+    """S&P 500 tickers, served from the warm-start service when it has them"""
+    return warm_service.tickers or scrape_sp500_tickers()
+
 # Sidebar for input controls
 with st.sidebar:
     st.header("分析设置")
@@ -94,12 +116,16 @@ with st.sidebar:
         sp500_tickers = get_sp500_tickers()
         tickers = sp500_tickers + extra_tickers
         st.info(f"📊 将分析 {len(sp500_tickers)} 只S&P 500股票 + {len(extra_tickers)} 只额外股票 = 总计 {len(tickers)} 只股票")
+        use_funnel = st.checkbox("两阶段筛选 (日线初筛)", value=True, help="先用全市场日线快照按放量、均线距离和日线MFI排序，只对排名靠前的股票获取小时数据")
+        keep_fraction = st.slider("初筛保留比例:", 0.05, 1.0, 0.2, 0.05, help="比例越高漏选越少，但小时数据获取成本越高", disabled=not use_funnel)
     else:
         ticker_input = st.text_input("输入美股代码列表 (e.g. AAPL,GOOG,MSFT):", "AAPL")
         tickers = [t.strip().upper() for t in ticker_input.split(',') if t.strip()]
+        use_funnel = False
     
-    start_date = st.date_input("开始日期:", value=None, min_value=None, max_value=None)
-    use_today = st.checkbox("使用今天日期", value=False)
+    # Defaults match the warm-start window so the first scan is served from warm state
+    start_date = st.date_input("开始日期:", value=datetime.today().date() - timedelta(days=warm_service.lookback_days), min_value=None, max_value=None)
+    use_today = st.checkbox("使用今天日期", value=True)
     if use_today:
         end_date = datetime.today().date()
         st.write(f"结束日期: {end_date.strftime('%Y-%m-%d')} (今日)")
@@ -115,107 +141,158 @@ with st.sidebar:
     lookback_window = st.slider("MA破位看回窗口:", 1, 10, 3)
     price_change_lookback = st.slider("价格变化看回窗口:", 1, 10, 3)
     price_change_threshold = st.slider("价格变化阈值 (%):", 0.0, 20.0, 5.0, 0.5)
+    screen_rule = st.text_input("筛选规则:", SCREEN_RULE, help="基于最新K线的筛选表达式，例如 rolling_min(MFI, 5) < 30 and MFI_SLOPE >= 1")
+    # Checked on entry, so a typo never aborts a scan halfway through
+    screen_rule_error = None
+    try:
+        validate_screen_rule(screen_rule)
+    except ValueError as e:
+        screen_rule_error = str(e)
+        st.error(f"筛选规则无效: {screen_rule_error}")
+    
+    st.subheader("扫描时限")
+    scan_budget_seconds = st.number_input("整体扫描时限 (秒):", 30, 3600, 300, 30, help="到时停止扫描并保留已完成的结果，未完成的股票会单独列出")
+    ticker_timeout_seconds = st.number_input("单只股票时限 (秒):", 5, 600, 60, 5, help="每个数据源单次最多尝试30秒后切换到下一个数据源")
+
+analysis_params = {
+    'mfi_period': mfi_period,
+    'mfi_slope_window': mfi_slope_window,
+    'volume_multiplier': volume_multiplier,
+    'signal_window': signal_window,
+    'slope_threshold': slope_threshold,
+    'lookback_window': lookback_window,
+    'price_change_lookback': price_change_lookback,
+    'price_change_threshold': price_change_threshold,
+}
+
+refresh_scheduler = RefreshScheduler()
 
 # Create a container for real-time error display
 error_container = st.container()
 
 # Define the analysis function
-def perform_analysis():
+def perform_analysis(refresh=False, time_budget=None):
+    """
+    Scan all tickers. Bars come from the shared cache while it is fresh; with refresh=True
+    they are re-downloaded. Tickers whose latest bar is unchanged keep their previous
+    results, and previous node caches mean parameter changes only rerun affected stages.
+    The scan stops at its time budget (time_budget seconds, default from the sidebar)
+    and keeps the partial results, listing the tickers it did not finish.
+    """
     if not tickers:
         st.error("❌ 请至少输入一个股票代码或启用S&P 500分析")
         return False
+    if screen_rule_error:
+        st.error(f"❌ 筛选规则无效，请先修正: {screen_rule_error}")
+        return False
     try:
-        with st.spinner(f'正在获取数据并计算指标... (0/{len(tickers)}股票)'):
+        # Global deadline and per-ticker limit, covering both screening stages; on expiry the scan returns what it has
+        budget = ScanBudget(time_budget or scan_budget_seconds, ticker_timeout_seconds)
+        
+        scan_tickers = tickers
+        if use_funnel:
+            # Stage one: rank the S&P 500 on a bulk daily snapshot, only the top candidates get hourly data
+            with st.spinner('正在进行日线初筛...'):
+                candidates, _ = prefilter_universe(sp500_tickers, keep_fraction=keep_fraction, deadline=budget.deadline, cancel=budget.cancel)
+            scan_tickers = candidates + [t for t in extra_tickers if t not in candidates]
+            st.caption(f"日线初筛: {len(sp500_tickers)} → {len(candidates)} 只S&P 500股票进入小时级分析")
+        
+        with st.spinner(f'正在获取数据并计算指标... (0/{len(scan_tickers)}股票)'):
             analyzers = {}
-            signaling_tickers = []
-            progress_bar = st.progress(0)
-            successful_count = 0
-            failed_tickers = []
+            # Coalesced progress bar, status line and live table of signaling tickers
+            progress = ScanProgress(len(scan_tickers), screen=lambda frames: screen_universe(frames, screen_rule))
+            
+            start_str = start_date.strftime('%Y-%m-%d') if start_date else None
+            end_str = end_date.strftime('%Y-%m-%d') if end_date else None
+            
+            # Analyzers from the previous run keep their node caches, so parameter tweaks only rerun affected stages
+            previous = st.session_state.analyzers or {}
             
-            # Clear the error container before starting
-            with error_container:
-                st.empty()
+            unchanged_count = 0
             
-            for i, t in enumerate(tickers):
-                try:
-                    analyzer = MarketAnalyzer()
-                    analyzer.fetch_data(t, start_date.strftime('%Y-%m-%d') if start_date else None, end_date.strftime('%Y-%m-%d') if end_date else None)
+            def scan_ticker(t, deadline, cancel):
+                """Runs on a worker thread: returns (analyzer, unchanged); no Streamlit calls here."""
+                analyzer = None if refresh else warm_service.get_analyzer(t, start_str, end_str)
+                if analyzer is None:
+                    reusable = previous.get(t)
+                    if reusable is not None and reusable.fetch_range != (t, start_str, end_str):
+                        reusable = None
+                    # Always fetch (served from the shared cache while it is fresh); the copied node
+                    # cache means a parameter-only rerun on unchanged bars only recomputes affected stages
+                    analyzer = reusable.copy() if reusable is not None else MarketAnalyzer()
+                    analyzer.fetch_data(t, start_str, end_str, use_cache=not refresh, deadline=deadline, cancel=cancel)
                     
                     # Skip if no data
                     if analyzer.data.empty:
-                        failed_tickers.append(t)
-                        with error_container:
-                            st.error(f"{t}: No data returned")
-                        continue
-                        
-                    analyzer.calculate_mfi(period=mfi_period, slope_window=mfi_slope_window)
-                    analyzer.calculate_ma()
-                    analyzer.calculate_obv()
-                    analyzer.calculate_candle_patterns(volume_multiplier=volume_multiplier)
-                    analyzer.generate_flags(signal_window=signal_window, slope_threshold=slope_threshold, 
-                                            lookback_window=lookback_window, price_change_lookback=price_change_lookback, 
-                                            price_change_threshold=price_change_threshold)
-                    analyzers[t] = analyzer
-                    successful_count += 1
-                    
-                    # Check for signals at the latest data point
-                    df = analyzer.data
-                    if not df.empty:
-                        latest = df.iloc[-1]
-                        # More flexible signal condition - at least 3 out of 4 conditions
-                        signal_conditions = [
-                            latest.get('MFI超卖反弹', False),
-                            latest.get('均线支持', False), 
-                            latest.get('Volume_Surge', False),
-                            latest.get('成交量增加', False)
-                        ]
-                        active_signals = sum(signal_conditions)
-                        if active_signals >= 3:  # At least 3 out of 4 conditions
-                            signaling_tickers.append(t)
-                    
-                    st.toast(f" {t} 分析完成 ({i+1}/{len(tickers)})", icon="✅")
+                        raise ValueError("No data returned")
                     
-                except Exception as e:
-                    failed_tickers.append(t)
-                    with error_container:
-                        st.error(f"{t}: {str(e)}")
-                    st.toast(f" {t} 分析失败: {str(e)[:50]}...", icon="❌")
-                
-                progress_bar.progress((i + 1) / len(tickers))
+                    # Latest bar unchanged since the last run: keep the previous results
+                    if (reusable is not None and reusable.params == analysis_params
+                            and bar_fingerprint(analyzer.bars) == bar_fingerprint(reusable.bars)):
+                        return reusable, True
+                        
+                analyzer.analyze(**analysis_params)
+                return analyzer, False
+            
+            def ticker_finished(t, result, error):
+                nonlocal unchanged_count
+                if error is not None:
+                    progress.ticker_done(t, error=str(error))
+                    return
+                analyzer, unchanged = result
+                analyzers[t] = analyzer
+                unchanged_count += unchanged
+                progress.ticker_done(t, analyzer.data)
+            
+            unfinished = run_budgeted(scan_tickers, scan_ticker, budget, ticker_finished)
+            
+            progress.finish()
+            # Results arrive in completion order; keep the input order so buttons and lists stay stable between runs
+            analyzers = {t: analyzers[t] for t in scan_tickers if t in analyzers}
+            signaling = set(progress.signaling_tickers)
+            signaling_tickers = [t for t in scan_tickers if t in signaling]
+            failed_tickers = list(progress.failed)
             
             # Update progress summary
-            progress_text = f"完成! 成功: {successful_count}/{len(tickers)} 股票"
+            progress_text = f"完成! 成功: {len(analyzers)}/{len(scan_tickers)} 股票"
+            if unchanged_count:
+                progress_text += f" | 无新数据: {unchanged_count} 股票"
             if failed_tickers:
                 progress_text += f" | 失败: {len(failed_tickers)} 股票"
-            st.success(progress_text)
+            if unfinished:
+                progress_text += f" | 超时未完成: {len(unfinished)} 股票"
+                st.warning(progress_text)
+            else:
+                st.success(progress_text)
+            
+            if unfinished:
+                with error_container:
+                    with st.expander(f"⏱️ 查看超时未完成的股票 ({len(unfinished)} 只)"):
+                        st.write(", ".join(unfinished))
             
             if failed_tickers:
-                with st.expander(f"❌ 查看失败的股票 ({len(failed_tickers)} 只)"):
-                    st.write(", ".join(failed_tickers[:20]))
-                    if len(failed_tickers) > 20:
-                        st.write(f"... 还有 {len(failed_tickers)-20} 只股票失败")
+                with error_container:
+                    with st.expander(f"❌ 查看失败的股票 ({len(failed_tickers)} 只)"):
+                        st.dataframe(pd.DataFrame(list(progress.failed.items()), columns=['股票', '错误']), hide_index=True)
         
         st.session_state.analyzers = analyzers
         st.session_state.signaling_tickers = signaling_tickers
-        st.session_state.attempted_count = len(tickers)
+        st.session_state.attempted_count = len(scan_tickers)
         st.session_state.show_dropdown = True  # Reset dropdown visibility after analysis
         
         # Compare with previous signaling tickers
+        diff = signal_diff(st.session_state.get('previous_signaling_tickers', []), signaling_tickers)
         if 'previous_signaling_tickers' in st.session_state:
-            prev = set(st.session_state.previous_signaling_tickers)
-            current = set(signaling_tickers)
-            new_signals = current - prev
-            disappeared = prev - current
-            stable = current & prev
             st.subheader("Signaling Stocks Comparison")
-            if new_signals:
-                st.success(f"New signaling stocks: {', '.join(sorted(new_signals))}")
-            if disappeared:
-                st.warning(f"Disappeared signaling stocks: {', '.join(sorted(disappeared))}")
-            if stable:
-                st.info(f"Stable signaling stocks: {', '.join(sorted(stable))}")
+            if diff['new']:
+                st.success(f"New signaling stocks: {', '.join(diff['new'])}")
+            if diff['disappeared']:
+                st.warning(f"Disappeared signaling stocks: {', '.join(diff['disappeared'])}")
+            if diff['stable']:
+                st.info(f"Stable signaling stocks: {', '.join(diff['stable'])}")
         
         st.session_state.previous_signaling_tickers = signaling_tickers.copy()
+        RESULTS.publish({t: a.data for t, a in analyzers.items()}, signaling_tickers, diff)
         
         return True
     except Exception as e:
@@ -233,22 +310,35 @@ with st.sidebar:
 with st.sidebar:
     st.subheader("定期分析")
     periodic = st.checkbox("启用定期分析", value=False)
-    period_minutes = 5
     if periodic:
-        period_minutes = st.slider("分析周期 (分钟)", min_value=1, max_value=60, value=5)
-        now = time.time()
-        time_passed = now - st.session_state.last_run_time > period_minutes * 60
-        if time_passed:
+        schedule_mode = st.radio("触发方式:", ["K线收盘后 (仅交易时段)", "固定间隔"], help="K线收盘模式只在交易时段内每根小时K线收盘后刷新，休市期间自动跳过")
+        period_minutes = 5
+        if schedule_mode == "固定间隔":
+            period_minutes = st.slider("分析周期 (分钟)", min_value=1, max_value=60, value=5)
+        
+        def next_run_time():
+            if schedule_mode == "固定间隔":
+                return st.session_state.last_run_time + period_minutes * 60
+            last_run = pd.Timestamp(st.session_state.last_run_time, unit='s', tz='UTC')
+            return refresh_scheduler.next_refresh(last_run).timestamp()
+        
+        def run_periodic_analysis():
             st.info("正在执行定期分析...")
-            success = perform_analysis()
-            if success:
-                st.session_state.last_run_time = time.time()
+            previous_run = st.session_state.last_run_time
+            # Schedule from the start of the scan and never let it run into the next one
+            st.session_state.last_run_time = time.time()
+            time_budget = min(scan_budget_seconds, max(next_run_time() - time.time(), 1))
+            if not perform_analysis(refresh=True, time_budget=time_budget):
+                st.session_state.last_run_time = previous_run
+        
+        if time.time() >= next_run_time():
+            run_periodic_analysis()
         
         # Create a dedicated container for the countdown
         countdown_container = st.container()
         with countdown_container:
             # Calculate initial remaining time
-            remaining_seconds = (st.session_state.last_run_time + period_minutes * 60 - time.time())
+            remaining_seconds = next_run_time() - time.time()
             if remaining_seconds < 0:
                 remaining_seconds = 0
             
@@ -257,8 +347,10 @@ with st.sidebar:
             
             # Update countdown every second
             while remaining_seconds > 0:
-                minutes = int(remaining_seconds // 60)
+                hours = int(remaining_seconds // 3600)
+                minutes = int(remaining_seconds % 3600 // 60)
                 seconds = int(remaining_seconds % 60)
+                timer_text = f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
                 countdown_placeholder.markdown(
                     f"""
                     <style>
@@ -285,20 +377,75 @@ with st.sidebar:
                     </style>
                     <div class="countdown-container">
                         <div class="countdown-text">下次自动分析</div>
-                        <div class="countdown-timer">{minutes:02d}:{seconds:02d}</div>
+                        <div class="countdown-timer">{timer_text}</div>
                     </div>
                     """,
                     unsafe_allow_html=True
                 )
                 time.sleep(1)
-                remaining_seconds = (st.session_state.last_run_time + period_minutes * 60 - time.time())
+                remaining_seconds = next_run_time() - time.time()
                 if remaining_seconds <= 0:
-                    st.info("正在执行定期分析...")
-                    success = perform_analysis()
-                    if success:
-                        st.session_state.last_run_time = time.time()
+                    run_periodic_analysis()
                     break
 
+# Live push mode: bars are built from streamed events and pushed into the analyzers
+with st.sidebar:
+    st.subheader("实时推送模式")
+    live_mode = st.checkbox("启用实时K线推送", value=False, help="通过websocket接收分钟聚合数据，在内存中生成小时K线并实时刷新信号（需先完成一次分析）")
+    live_source = None
+    replay_path = ""
+    replay_speed = 0.0
+    if live_mode:
+        live_source = st.selectbox("数据源:", ["Polygon websocket", "本地回放文件"])
+        if live_source == "本地回放文件":
+            replay_path = st.text_input("回放文件路径 (JSONL):", "")
+            replay_speed = st.slider("回放速度倍数 (0 = 最快):", 0.0, 600.0, 60.0, 10.0)
+
+def stop_live_ingestor():
+    if st.session_state.live_ingestor is not None:
+        st.session_state.live_ingestor.stop()
+    st.session_state.live_ingestor = None
+    st.session_state.live_key = None
+
+if live_mode and st.session_state.analyzers and (live_source == "Polygon websocket" or replay_path):
+    # A new analysis run replaces the analyzers dict, which restarts ingestion on the new results
+    live_key = (live_source, replay_path, replay_speed, id(st.session_state.analyzers))
+    if st.session_state.live_key != live_key:
+        stop_live_ingestor()
+        # Private copies: warm-start analyzers are shared across sessions
+        st.session_state.analyzers = {t: a.copy() for t, a in st.session_state.analyzers.items()}
+        if live_source == "Polygon websocket":
+            source = PolygonStreamSource(st.session_state.analyzers.keys())
+        else:
+            source = ReplaySource(replay_path, speed=replay_speed)
+        st.session_state.live_ingestor = LiveIngestor(st.session_state.analyzers, source)
+        st.session_state.live_ingestor.start()
+        st.session_state.live_key = (live_source, replay_path, replay_speed, id(st.session_state.analyzers))
+elif not live_mode:
+    stop_live_ingestor()
+
+live_ingestor = st.session_state.live_ingestor
+if live_ingestor is not None:
+    source_error = getattr(live_ingestor.source, 'last_error', None)
+    if not live_ingestor.running and live_ingestor.last_error:
+        st.sidebar.error(f"实时推送已停止: {live_ingestor.last_error}")
+    elif source_error:
+        st.sidebar.warning(f"实时推送连接异常: {source_error}")
+    elif live_ingestor.last_error:
+        st.sidebar.warning(f"实时推送: {live_ingestor.last_error}")
+    if live_ingestor.version != st.session_state.live_version and not screen_rule_error:
+        with live_ingestor.lock:
+            frames = {t: a.data for t, a in st.session_state.analyzers.items()}
+        try:
+            st.session_state.signaling_tickers = screen_universe(frames, screen_rule)
+        except Exception as e:
+            st.sidebar.warning(f"实时筛选失败: {e}")
+        else:
+            st.session_state.live_version = live_ingestor.version
+            # Live changes are diffed against the last full scan
+            RESULTS.publish(frames, st.session_state.signaling_tickers,
+                            signal_diff(st.session_state.get('previous_signaling_tickers', []), st.session_state.signaling_tickers))
+
 # Display results if data is available
 if st.session_state.analyzers is not None and st.session_state.analyzers:
     total_analyzed = len(st.session_state.analyzers)
@@ -344,7 +491,12 @@ if st.session_state.analyzers is not None and st.session_state.analyzers:
     selected_ticker = st.session_state.selected_ticker
     if selected_ticker and selected_ticker in st.session_state.analyzers:
         analyzer = st.session_state.analyzers[selected_ticker]
-        fig_candle, fig_multi = analyzer.create_figures(analyzer.data)
+        if live_ingestor is not None:
+            with live_ingestor.lock:
+                chart_data = analyzer.data.copy()
+        else:
+            chart_data = analyzer.data
+        fig_candle, fig_multi = analyzer.create_figures(chart_data)
         
         # Candlestick chart with auto-scaling
         st.plotly_chart(fig_candle, use_container_width=False, config={'displayModeBar': True})
@@ -357,4 +509,9 @@ if st.session_state.analyzers is not None and st.session_state.analyzers:
 else:
     if st.sidebar.button("🔄 刷新S&P 500列表"):
         st.cache_data.clear()
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+# Keep the page in step with pushed bars
+if live_ingestor is not None and live_ingestor.running:
+    time.sleep(2)
+    st.rerun()